@@ -0,0 +1,214 @@
+"""
+Concurrency benchmark of the request handling model before and after the
+move to Quart.
+
+Both apps serve the shape of an /api/postVoice request: a blocking stage
+(ffmpeg and Whisper stand-in) followed by a few Hume API calls through the
+pooled async client, answered by a local stand-in with a fixed delay.
+
+  flask  Flask async view under the threaded Werkzeug server: every request
+         gets its own event loop, the blocking stage runs inline on the
+         request thread and Hume calls hop to the background client loop.
+  quart  Quart under hypercorn: one event loop, the blocking stage runs on
+         an executor and Hume calls run on the serving loop.
+
+Usage (from Backend/):
+    python benchmarks/bench_asgi_concurrency.py [--concurrency 1 16 64] [--requests 128]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+JOB_DETAILS = {
+    "type": "INFERENCE",
+    "job_id": "standin",
+    "user_id": "standin",
+    "request": {"files": [], "urls": [], "text": [], "notify": False},
+    "state": {
+        "status": "COMPLETED",
+        "created_timestamp_ms": 0,
+        "started_timestamp_ms": 0,
+        "ended_timestamp_ms": 0,
+        "num_predictions": 0,
+        "num_errors": 0,
+    },
+}
+API_DELAY = 0.02  # Seconds the stand-in API takes per call
+BLOCKING_SECONDS = 0.05  # The blocking stage's duration
+HUME_CALLS = 5
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(API_DELAY)
+        body = json.dumps(JOB_DETAILS).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def blocking_stage():
+    # Busy, not sleeping, like ffmpeg and Whisper holding the request's thread
+    deadline = time.perf_counter() + BLOCKING_SECONDS
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def hume_calls():
+    import clients
+
+    client = clients.get_hume_client()
+    for _ in range(HUME_CALLS):
+        await client.expression_measurement.batch.get_job_details("standin")
+
+
+def serve_flask(port):
+    import logging
+
+    from flask import Flask, jsonify
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import clients
+
+    app = Flask(__name__)
+
+    @app.route("/analyze", methods=["POST"])
+    async def analyze():
+        blocking_stage()
+        await clients.on_client_loop(hume_calls())
+        return jsonify({"ok": True})
+
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def serve_quart(port):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from quart import Quart, jsonify
+
+    import clients
+
+    app = Quart(__name__)
+    executor = ThreadPoolExecutor(max_workers=8)
+
+    @app.before_serving
+    async def start_clients():
+        clients.bind_client_loop(asyncio.get_running_loop())
+
+    @app.route("/analyze", methods=["POST"])
+    async def analyze():
+        await asyncio.get_running_loop().run_in_executor(executor, blocking_stage)
+        await clients.on_client_loop(hume_calls())
+        return jsonify({"ok": True})
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.loglevel = "WARNING"
+    config.accesslog = None
+    asyncio.run(serve(app, config))
+
+
+async def load(port, concurrency, requests):
+    import httpx
+
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        url = f"http://127.0.0.1:{port}/analyze"
+        for _ in range(50):  # Wait for the server to come up
+            try:
+                await client.post(url)
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post(url)
+                assert response.status_code == 200, response.status_code
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies)
+
+
+def run_server(kind, api_url, port):
+    os.environ.update({"HUME_BASE_URL": api_url, "API_KEY": "standin"})
+    (serve_flask if kind == "flask" else serve_quart)(port)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--serve", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        kind, api_url, port = args.serve
+        run_server(kind, api_url, int(port))
+        return
+
+    api = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{api.server_address[1]}"
+
+    print(
+        f"Per request: {BLOCKING_SECONDS * 1000:.0f} ms blocking stage + "
+        f"{HUME_CALLS} API calls of {API_DELAY * 1000:.0f} ms"
+    )
+    for kind in ("flask", "quart"):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, __file__, "--serve", kind, api_url, str(port)]
+        )
+        try:
+            for concurrency in args.concurrency:
+                elapsed, latencies = asyncio.run(load(port, concurrency, args.requests))
+                p50 = latencies[len(latencies) // 2]
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(
+                    f"{kind:<6} concurrency {concurrency:>3}: "
+                    f"{args.requests / elapsed:6.1f} req/s  "
+                    f"p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
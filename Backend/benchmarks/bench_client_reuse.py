@@ -0,0 +1,95 @@
+"""
+Shows Hume and Groq connections being reused by the shared clients.
+
+The local HTTP/1.1 stand-in from tests/test_clients.py plays both APIs and
+counts the TCP connections it accepts. The same number of calls is made with
+a new client per call (how the server used to work) and with the shared
+clients from clients.py. tests/test_clients.py asserts the reuse; this only
+reports it.
+
+Usage (from Backend/):
+    python benchmarks/bench_client_reuse.py [--requests 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from test_clients import StandInHandler, reset, start_stand_in  # noqa: E402
+
+def report(label, started):
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<28} {StandInHandler.requests:>4} requests over "
+        f"{len(StandInHandler.connections):>3} connections in {elapsed:.3f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    server, base_url = start_stand_in()
+    os.environ.update({"API_KEY": "standin", "GROQ_KEY": "standin"})
+
+    from groq import Groq
+    from hume import AsyncHumeClient
+
+    import clients
+
+    # Imported along with the stand-in, so the base URLs are set here
+    clients.HUME_BASE_URL = clients.GROQ_BASE_URL = base_url
+
+    messages = [{"role": "user", "content": "hi"}]
+    model = "llama-3.1-8b-instant"
+
+    reset()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        client = Groq(api_key="standin", base_url=base_url)
+        client.chat.completions.create(messages=messages, model=model)
+        client.close()
+    report("Groq, client per request", started)
+
+    reset()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        clients.get_groq_client().chat.completions.create(messages=messages, model=model)
+    report("Groq, shared client", started)
+
+    async def per_request_hume():
+        for _ in range(args.requests):
+            client = AsyncHumeClient(api_key="standin", base_url=base_url)
+            await client.expression_measurement.batch.get_job_details("standin")
+
+    reset()
+    started = time.perf_counter()
+    asyncio.run(per_request_hume())
+    report("Hume, client per request", started)
+
+    async def shared_hume():
+        client = clients.get_hume_client()
+        for _ in range(args.requests):
+            await client.expression_measurement.batch.get_job_details("standin")
+
+    async def request_handler():
+        # Code on its own loop hops to the client loop
+        await clients.on_client_loop(shared_hume())
+
+    reset()
+    started = time.perf_counter()
+    for _ in range(2):
+        asyncio.run(request_handler())
+    report("Hume, shared client (2 loops)", started)
+
+    clients.shutdown_clients()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
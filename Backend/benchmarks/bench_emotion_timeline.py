@@ -0,0 +1,84 @@
+"""
+Shows how much of a feedback prompt the emotion timeline takes before and
+after compaction, and checks that scoring from the compacted timeline's
+window sums matches scoring the raw readings.
+
+Synthetic EVI readings (every emotion scored, one reading every couple of
+seconds) stand in for what the Interview page stores in localStorage.
+
+Usage (from Backend/):
+    python benchmarks/bench_emotion_timeline.py [--minutes 30] [--budget 600]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from feedback import CHARS_PER_TOKEN  # noqa: E402
+from scoring import EMOTION_WEIGHTS, ScoringEngine  # noqa: E402
+from timeline import EmotionTimeline  # noqa: E402
+
+
+def synthetic_readings(minutes, rng):
+    readings = []
+    timestamp = 0.0
+    while timestamp < minutes * 60:
+        # Slow drift between calm and anxious stretches, plus noise
+        arc = (math.sin(timestamp / 90) + 1) / 2
+        readings.append(
+            {
+                "timestamp": f"{timestamp:.2f}",
+                "emotions": {
+                    name: max(
+                        0.0,
+                        rng.random() * 0.2
+                        + (arc * 0.6 if name == "Calmness" else 0)
+                        + ((1 - arc) * 0.5 if name == "Anxiety" else 0),
+                    )
+                    for name in EMOTION_WEIGHTS
+                },
+            }
+        )
+        timestamp += rng.uniform(1, 3)
+    return readings
+
+
+def tokens(value):
+    return math.ceil(len(repr(value)) / CHARS_PER_TOKEN)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--budget", type=int, default=600)
+    args = parser.parse_args()
+
+    readings = synthetic_readings(args.minutes, random.Random(0))
+
+    started = time.perf_counter()
+    timeline = EmotionTimeline.from_readings(readings)
+    compacted = timeline.compact(token_budget=args.budget, weights=EMOTION_WEIGHTS)
+    elapsed = time.perf_counter() - started
+
+    # Compare the emotional component before it is clamped to 0..50
+    engine = ScoringEngine()
+    raw_total = float(engine.emotion_scores([readings])[0])
+    totals = timeline.emotion_totals()
+    timeline_total = sum(EMOTION_WEIGHTS.get(name, 0) * total for name, total in totals.items())
+    assert math.isclose(raw_total, timeline_total, rel_tol=1e-9), (raw_total, timeline_total)
+    assert engine.score_timeline(timeline, []) == engine.score_interview(readings, [])
+
+    print(f"{len(readings)} readings over {args.minutes:g} minutes")
+    print(f"  raw timeline       : {tokens(readings):>8} tokens")
+    print(f"  {len(timeline):>4} windows, top-k : {tokens(timeline.compact(token_budget=10**9)):>8} tokens")
+    print(f"  {len(compacted):>4} points kept  : {tokens(compacted):>8} tokens (budget {args.budget})")
+    print(f"  compaction time    : {elapsed * 1000:8.1f} ms")
+    print(f"  emotion score raw / timeline: {raw_total:.9f} / {timeline_total:.9f}")
+
+
+if __name__ == "__main__":
+    main()
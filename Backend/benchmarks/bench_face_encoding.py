@@ -0,0 +1,95 @@
+"""
+Compares the clips sent to Hume with the "source" and "face" clip encodings:
+clip count, upload size and splitting time per job, and with --hume the Hume
+turnaround (upload to predictions) and how many face frames came back.
+
+--hume runs real batch jobs with the API_KEY from the environment.
+
+Usage (from Backend/):
+    python benchmarks/bench_face_encoding.py recording.mp4 [--hume]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+import clips  # noqa: E402
+from clients import get_hume_client, run_on_client_loop  # noqa: E402
+from facs import FacsSeries  # noqa: E402
+
+
+async def hume_turnaround(video_files, encoding):
+    from hume.expression_measurement.batch import Face, Models
+    from hume.expression_measurement.batch.types import InferenceBaseRequest
+
+    client = get_hume_client()
+    face_options = {"fps_pred": 0} if encoding == "face" else {}
+    request = InferenceBaseRequest(models=Models(face=Face(facs={}, **face_options)))
+    files = [open(path, "rb") for path in video_files]
+    try:
+        started = time.perf_counter()
+        job_id = await client.expression_measurement.batch.start_inference_job_from_local_file(
+            json=request, file=files
+        )
+        while True:
+            details = await client.expression_measurement.batch.get_job_details(job_id)
+            if details.state.status in ("COMPLETED", "FAILED"):
+                break
+            await asyncio.sleep(1)
+        predictions = await client.expression_measurement.batch.get_job_predictions(id=job_id)
+        elapsed = time.perf_counter() - started
+    finally:
+        for file in files:
+            file.close()
+    return elapsed, details.state.status, len(FacsSeries.from_predictions(predictions, {}))
+
+
+def run(recording, encoding, with_hume):
+    clips.CLIP_ENCODING = encoding
+    output_dir = tempfile.mkdtemp(prefix="bench_clips_")
+    try:
+        started = time.perf_counter()
+        windows, video_files, _ = clips.split_with_ffmpeg(recording, output_dir)
+        split_seconds = time.perf_counter() - started
+        upload_bytes = sum(os.path.getsize(path) for path in video_files)
+        line = (
+            f"{encoding:>6}: {len(video_files)} clips, {upload_bytes / 2**20:8.2f} MiB upload, "
+            f"split {split_seconds:6.2f}s"
+        )
+        if with_hume and video_files:
+            turnaround, status, frames = run_on_client_loop(
+                hume_turnaround(video_files, encoding)
+            )
+            line += f", Hume {status.lower()} in {turnaround:6.1f}s with {frames} face frames"
+        print(line)
+        return upload_bytes
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording")
+    parser.add_argument("--hume", action="store_true", help="Also run real Hume batch jobs")
+    args = parser.parse_args()
+
+    print(
+        f"face profile: {clips.FACE_VIDEO_HEIGHT}p, {clips.FACE_VIDEO_FPS:g} fps, "
+        f"{clips.FACE_VIDEO_KBPS} kbit/s, no audio"
+    )
+    source_bytes = run(args.recording, "source", args.hume)
+    face_bytes = run(args.recording, "face", args.hume)
+    print(f"upload size: {face_bytes / max(source_bytes, 1):.1%} of the source encoding")
+
+
+if __name__ == "__main__":
+    main()
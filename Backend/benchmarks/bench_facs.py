@@ -0,0 +1,99 @@
+"""
+Microbenchmark of FACS aggregation on synthetic Hume face prediction payloads.
+
+Compares the old nested-loop aggregation (sum / 15, full sort) with
+facs.get_top_facs and checks both pick the same units per clip.
+
+Usage (from Backend/):
+    python benchmarks/bench_facs.py [--clips 20] [--frames 5000]
+"""
+import argparse
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from facs import get_top_facs  # noqa: E402
+
+UNITS = [f"AU{i} UNIT" for i in range(1, 27)] + ["SMILE", "LAUGH", "CRY", "JAW DROP"]
+
+
+def synthetic_predictions(clips, frames, seed=0):
+    rng = np.random.default_rng(seed)
+    ns = types.SimpleNamespace
+    files = []
+    for clip in range(clips):
+        bias = rng.random(len(UNITS))
+        frame_preds = [
+            ns(
+                time=i / 30,
+                facs=[ns(name=name, score=float(score)) for name, score in zip(UNITS, row)],
+            )
+            for i, row in enumerate(rng.random((frames, len(UNITS))) * bias)
+        ]
+        prediction = ns(
+            file=f"video_{clip}.mp4",
+            models=ns(face=ns(grouped_predictions=[ns(predictions=frame_preds)])),
+        )
+        files.append(ns(results=ns(predictions=[prediction])))
+    return files
+
+
+def legacy_top_3_facs(predictions):
+    """The aggregation server.get_top_3_facs used to do."""
+    top_facs_per_clip = []
+    for pred in predictions:
+        for prediction in pred.results.predictions:
+            facs_map = {}
+            for grouped_preds in prediction.models.face.grouped_predictions:
+                for frame in grouped_preds.predictions:
+                    for facs_score in frame.facs:
+                        if facs_score.name not in facs_map:
+                            facs_map[facs_score.name] = (facs_score.score, prediction.file)
+                        else:
+                            existing_score, _ = facs_map[facs_score.name]
+                            facs_map[facs_score.name] = (
+                                existing_score + facs_score.score,
+                                prediction.file,
+                            )
+            for key in facs_map.keys():
+                score, file = facs_map[key]
+                facs_map[key] = (score / 15.0, file)
+            top_3 = sorted(facs_map.items(), key=lambda x: x[1][0], reverse=True)[:3]
+            top_facs_per_clip.extend((name, score, file) for name, (score, file) in top_3)
+    return top_facs_per_clip
+
+
+def best_of(fn, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=5000)
+    args = parser.parse_args()
+
+    predictions = synthetic_predictions(args.clips, args.frames)
+    legacy_time, legacy = best_of(lambda: legacy_top_3_facs(predictions))
+    new_time, new = best_of(lambda: get_top_facs(predictions, k=3))
+
+    assert [(name, file) for name, _, file in legacy] == [
+        (name, file) for name, _, file in new
+    ], "Top units differ"
+    print(f"{args.clips} clips x {args.frames} frames x {len(UNITS)} units")
+    print(f"  legacy loops : {legacy_time * 1000:8.1f} ms")
+    print(f"  get_top_facs : {new_time * 1000:8.1f} ms  ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Measures how long after a Hume batch job finishes the waiting request notices,
+with polling only and with completion callbacks.
+
+A stand-in batch client finishes each job after a random duration and, in
+callback mode, fires the callback the way /api/hume/callback hands it to the
+poller (call_soon_threadsafe -> HumeJobPoller.expedite) from another thread.
+Some callbacks can be dropped to show the polling fallback.
+
+Usage (from Backend/):
+    python benchmarks/bench_hume_callback.py [--jobs 40] [--drop 0.1]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from poller import HumeJobPoller  # noqa: E402
+from pools import percentiles  # noqa: E402
+
+
+class StandInBatch:
+    """Just enough of client.expression_measurement.batch for the poller."""
+
+    def __init__(self, on_finish=None, drop=0.0):
+        self.finish_at = {}
+        self.on_finish = on_finish
+        self.drop = drop
+        self.polls = 0
+
+    def start(self, job_id, duration):
+        self.finish_at[job_id] = time.monotonic() + duration
+        if self.on_finish is not None and random.random() >= self.drop:
+            timer = threading.Timer(duration, self.on_finish, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+
+    async def get_job_details(self, job_id):
+        self.polls += 1
+        await asyncio.sleep(0.05)  # Round trip to the API
+        done = time.monotonic() >= self.finish_at[job_id]
+        state = types.SimpleNamespace(
+            status="COMPLETED" if done else "IN_PROGRESS",
+            created_timestamp_ms=None,
+            ended_timestamp_ms=None,
+        )
+        return types.SimpleNamespace(state=state)
+
+
+async def run(jobs, use_callbacks, drop):
+    loop = asyncio.get_running_loop()
+    poller = HumeJobPoller(fallback_interval=5.0)
+
+    def fire_callback(job_id):
+        loop.call_soon_threadsafe(poller.expedite, job_id)
+
+    batch = StandInBatch(fire_callback if use_callbacks else None, drop)
+    client = types.SimpleNamespace(
+        expression_measurement=types.SimpleNamespace(batch=batch)
+    )
+
+    async def one(job_id):
+        await asyncio.sleep(random.uniform(0, 5))  # Uploads arrive over time
+        batch.start(job_id, random.uniform(8, 25))
+        await poller.wait(client, job_id, expect_callback=use_callbacks)
+        return time.monotonic() - batch.finish_at[job_id]
+
+    lags = await asyncio.gather(*(one(f"job-{i}") for i in range(jobs)))
+    return lags, batch.polls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--drop", type=float, default=0.1, help="Fraction of callbacks lost")
+    args = parser.parse_args()
+
+    for label, use_callbacks in (("polling only", False), ("callbacks", True)):
+        random.seed(0)
+        lags, polls = asyncio.run(run(args.jobs, use_callbacks, args.drop))
+        print(
+            f"{label:<13} detection lag {percentiles(lags)}  "
+            f"max {max(lags):.2f}s  polls {polls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark of interview scoring: the old per-request closures from
+get_feedback against scoring.py on synthetic interviews (best of 3). The
+golden check that every score is identical lives in tests/test_scoring.py.
+
+Usage (from Backend/):
+    python benchmarks/bench_scoring.py [--interviews 500] [--readings 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+from scoring import score_interview, score_interviews  # noqa: E402
+from test_scoring import legacy_interview_score, synthetic_interviews  # noqa: E402
+
+
+def best_of(fn, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interviews", type=int, default=500)
+    parser.add_argument("--readings", type=int, default=200)
+    args = parser.parse_args()
+
+    interviews = synthetic_interviews(args.interviews, args.readings)
+
+    legacy_time, _ = best_of(
+        lambda: [legacy_interview_score(*interview) for interview in interviews]
+    )
+    batch_time, _ = best_of(lambda: score_interviews(interviews))
+    single_time, _ = best_of(
+        lambda: [score_interview(*interview) for interview in interviews]
+    )
+
+    print(f"{len(interviews)} interviews")
+    print(f"  legacy closures    : {legacy_time * 1000:8.1f} ms")
+    print(f"  score_interview    : {single_time * 1000:8.1f} ms  ({legacy_time / single_time:.1f}x)")
+    print(f"  score_interviews   : {batch_time * 1000:8.1f} ms  ({legacy_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares fixed-length and pause-aligned clip boundaries: how many cuts fall
+in the middle of speech (splitting words), the number of clips and their
+lengths, including the clip cap on long recordings.
+
+Without recordings, the synthetic interview from bench_vad.py is used.
+
+Usage (from Backend/):
+    python benchmarks/bench_segmentation.py [recording.mp4 ...] [--minutes 20 90]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio import SAMPLE_RATE, VAD_FRAME_SECONDS, decode_audio, speech_frames  # noqa: E402
+from bench_vad import synthetic_interview  # noqa: E402
+from clips import clip_windows  # noqa: E402
+from transcription import CLIP_DURATION, MAX_CLIPS_PER_JOB, segment_windows  # noqa: E402
+
+
+def describe(label, windows, speech, elapsed=None):
+    cuts = [end for _, end in windows[:-1]]
+    in_speech = sum(bool(speech[min(int(cut / VAD_FRAME_SECONDS), len(speech) - 1)]) for cut in cuts)
+    lengths = np.array([end - start for start, end in windows])
+    line = (
+        f"  {label:<6} {len(windows):>4} clips  {in_speech:>4}/{len(cuts)} cuts in speech  "
+        f"length {lengths.min():5.2f}-{lengths.max():5.2f}s (mean {lengths.mean():5.2f}s)"
+    )
+    if elapsed is not None:
+        line += f"  segmentation {elapsed * 1000:.1f} ms"
+    print(line)
+
+
+def compare(name, audio):
+    duration = audio.shape[0] / SAMPLE_RATE
+    speech = speech_frames(audio)
+    print(f"{name} ({duration / 60:.1f} min, cap {MAX_CLIPS_PER_JOB} clips):")
+    describe("fixed", clip_windows(duration, CLIP_DURATION), speech)
+    started = time.perf_counter()
+    windows = segment_windows(audio)
+    describe("pause", windows, speech, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recordings", nargs="*")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[20, 90])
+    args = parser.parse_args()
+
+    if args.recordings:
+        for path in args.recordings:
+            compare(os.path.basename(path), decode_audio(path))
+    else:
+        for minutes in args.minutes:
+            compare(
+                f"synthetic {minutes:g} min interview",
+                synthetic_interview(minutes, np.random.default_rng(0)),
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares the per-clip and single-pass transcription paths on one recording.
+
+Usage (from Backend/):
+    python benchmarks/bench_transcription.py recording.mp4 [--reference ref.txt]
+
+Without a reference transcript, WER is reported between the two paths.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio import SAMPLE_RATE  # noqa: E402
+from inference import get_pool, shutdown_pool, transcribe_many  # noqa: E402
+from transcription import extract_video_audio, remove_clip_files  # noqa: E402
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def warm_up():
+    """
+    Loads Whisper wherever the benchmark will run it, the worker pool or this
+    process, and decodes one dummy batch, so neither measurement pays for it.
+    """
+    pool = get_pool()
+    if pool is not None:
+        while len(pool.stats()["worker_models"]) < pool.workers:
+            time.sleep(0.1)
+    # One clip per worker, so every worker has decoded once
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    clips = [silence] * (pool.workers if pool is not None else 1)
+    transcribe_many(clips, task="transcribe", language="en")
+
+
+def run(video_file_path, mode):
+    start = time.perf_counter()
+    transcriptions, video_files, audio_files = extract_video_audio(
+        video_file_path, mode=mode
+    )
+    elapsed = time.perf_counter() - start
+    remove_clip_files(video_files, audio_files)
+    text = " ".join(text for clip in transcriptions for text in clip.values())
+    return elapsed, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--reference", help="Plain-text reference transcript")
+    args = parser.parse_args()
+
+    warm_up()
+    try:
+        results = {mode: run(args.video, mode) for mode in ("clip", "full")}
+    finally:
+        shutdown_pool()
+    reference = open(args.reference).read() if args.reference else None
+
+    for mode, (elapsed, text) in results.items():
+        line = f"{mode:>5}: {elapsed:7.2f}s"
+        if reference is not None:
+            line += f"  WER {word_error_rate(reference, text):.3f}"
+        print(line)
+
+    if reference is None:
+        wer = word_error_rate(results["clip"][1], results["full"][1])
+        print(f"WER of full vs clip: {wer:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Measures peak RSS while uploading recordings of growing size through the
+streaming upload path, and fails if it grows with the upload.
+
+Usage (from Backend/):
+    python benchmarks/bench_upload_rss.py [--sizes-mb 16 128 512]
+
+Each size runs in a fresh subprocess so peak RSS is not shared between runs.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+CHUNK = b"\0" * (1024 * 1024)
+
+
+class GeneratedBody:
+    """A multipart body produced on the fly, so the client side stays small too."""
+
+    def __init__(self, size_mb, boundary):
+        self.head = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="recording.mp4"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+        self.tail = f"\r\n--{boundary}--\r\n".encode()
+        self.remaining = size_mb
+        self.length = len(self.head) + size_mb * len(CHUNK) + len(self.tail)
+        self.buffer = self.head
+
+    def read(self, size=-1):
+        while len(self.buffer) < max(size, 1) and self.remaining >= 0:
+            if self.remaining > 0:
+                self.buffer += CHUNK
+            else:
+                self.buffer += self.tail
+            self.remaining -= 1
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def measure(size_mb):
+    """Uploads size_mb MiB to a minimal app using the streaming request class."""
+    import asyncio
+
+    from quart import Quart, jsonify, request
+
+    from uploads import (
+        BackpressureHTTPConnection,
+        StreamingUploadRequest,
+        remove_scratch_files,
+        scratch_path,
+    )
+
+    app = Quart(__name__)
+    app.request_class = StreamingUploadRequest
+    app.asgi_http_class = BackpressureHTTPConnection
+    app.config["MAX_CONTENT_LENGTH"] = None
+
+    @app.route("/upload", methods=["POST"])
+    async def upload():
+        path = scratch_path((await request.files)["file"])
+        return jsonify({"bytes": os.path.getsize(path)})
+
+    @app.teardown_request
+    async def teardown(exception=None):
+        remove_scratch_files(request)
+
+    boundary = "benchmarkboundary"
+    body = GeneratedBody(size_mb, boundary)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+            (b"content-length", str(body.length).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+        "extensions": {},
+    }
+    sent = []
+
+    async def run():
+        body_sent = False
+        response_done = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if body_sent:
+                # Like a server, report the disconnect once the response is out
+                await response_done.wait()
+                return {"type": "http.disconnect"}
+            # Hand the body over in server-sized chunks
+            data = body.read(64 * 1024)
+            body_sent = not data
+            return {"type": "http.request", "body": data, "more_body": bool(data)}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                response_done.set()
+
+        await app(scope, receive, send)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    asyncio.run(run())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    assert status == 200, (status, payload)
+    assert json.loads(payload)["bytes"] == size_mb * len(CHUNK)
+    print((peak - baseline) // 1024)  # MiB above the pre-upload peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[16, 128, 512])
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        measure(args.single)
+        return
+
+    growth = {}
+    for size_mb in args.sizes_mb:
+        output = subprocess.run(
+            [sys.executable, __file__, "--single", str(size_mb)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        growth[size_mb] = int(output.split()[-1])
+        print(f"{size_mb:>6} MiB upload: peak RSS +{growth[size_mb]} MiB")
+
+    # Allow a little allocator noise, but nothing proportional to the upload
+    assert max(growth.values()) < 32, "Peak RSS grows with upload size"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Reports how much transcription and face-analysis work the voice-activity
+detector saves: the share of clips (and seconds of audio) found silent, which
+Whisper and the Hume upload skip.
+
+Without recordings, a synthetic interview is used: answers of speech-like
+bursts separated by thinking pauses, and stretches of listening to the
+interviewer with only room noise.
+
+Usage (from Backend/):
+    python benchmarks/bench_vad.py [recording.mp4 ...] [--clip-duration 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio import SAMPLE_RATE, decode_audio, silent_windows  # noqa: E402
+from clips import clip_windows  # noqa: E402
+
+
+def synthetic_interview(minutes, rng):
+    """Room noise throughout, with speech in the answers only."""
+    samples = int(minutes * 60 * SAMPLE_RATE)
+    audio = rng.standard_normal(samples) * 10 ** (-60 / 20)
+    position = 0
+    while position < samples:
+        # Listen to the question, then answer in bursts with short pauses
+        position += int(rng.uniform(5, 20) * SAMPLE_RATE)
+        answer_end = min(samples, position + int(rng.uniform(20, 90) * SAMPLE_RATE))
+        while position < answer_end:
+            burst = min(int(rng.uniform(0.5, 4) * SAMPLE_RATE), answer_end - position)
+            t = np.arange(burst) / SAMPLE_RATE
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)  # ~4 syllables a second
+            audio[position : position + burst] += (
+                rng.standard_normal(burst) * 10 ** (-20 / 20) * envelope
+            )
+            position += burst + int(rng.uniform(0.2, 8) * SAMPLE_RATE)
+    return audio.astype(np.float32)
+
+
+def measure(name, audio, clip_duration):
+    duration = audio.shape[0] / SAMPLE_RATE
+    windows = clip_windows(duration, clip_duration)
+    started = time.perf_counter()
+    silent = silent_windows(audio, windows)
+    elapsed = time.perf_counter() - started
+    silent_seconds = sum(end - start for (start, end), s in zip(windows, silent) if s)
+    total_seconds = sum(end - start for start, end in windows)
+    print(
+        f"{name}: {sum(silent)}/{len(windows)} clips silent, "
+        f"{silent_seconds:.0f}/{total_seconds:.0f}s "
+        f"({silent_seconds / max(total_seconds, 1e-9):.0%} of Whisper and Hume work skipped), "
+        f"VAD took {elapsed * 1000:.1f} ms"
+    )
+    return silent_seconds, total_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recordings", nargs="*")
+    parser.add_argument("--clip-duration", type=int, default=5)
+    parser.add_argument("--minutes", type=float, default=20, help="Synthetic interview length")
+    args = parser.parse_args()
+
+    if args.recordings:
+        totals = [
+            measure(os.path.basename(path), decode_audio(path), args.clip_duration)
+            for path in args.recordings
+        ]
+        silent = sum(s for s, _ in totals)
+        total = sum(t for _, t in totals)
+        print(f"overall: {silent / max(total, 1e-9):.0%} of clip seconds skipped")
+    else:
+        rng = np.random.default_rng(0)
+        measure(
+            f"synthetic {args.minutes:g} min interview",
+            synthetic_interview(args.minutes, rng),
+            args.clip_duration,
+        )
+
+
+if __name__ == "__main__":
+    main()
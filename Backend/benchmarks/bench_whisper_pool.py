@@ -0,0 +1,142 @@
+"""
+Throughput of Whisper transcription inline versus on the worker pool, across
+pool sizes, torch threads per worker, queue depths and batch sizes.
+
+Simulates --requests concurrent uploads, each transcribing --clips clips of
+CLIP_DURATION seconds cut from one recording (or from noise when no recording
+is given), and reports clips per second, per-upload latency, the batch size
+the pool achieved and per-clip latency.
+
+Usage (from Backend/):
+    python benchmarks/bench_whisper_pool.py [recording.mp4] [--workers 1 2 4]
+        [--threads 1 2 4] [--queue-depth 8 64] [--max-batch 1 16]
+        [--max-wait-ms 20] [--requests 4] [--clips 12]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from audio import SAMPLE_RATE, decode_audio, slice_audio  # noqa: E402
+from inference import WhisperPool  # noqa: E402
+from model_registry import DEFAULT_MODEL, get_model  # noqa: E402
+from transcription import CLIP_DURATION  # noqa: E402
+
+OPTIONS = {"task": "transcribe", "language": "en"}
+
+
+def clip_audio(recording, clips):
+    if recording:
+        audio = decode_audio(recording)
+    else:
+        noise = np.random.default_rng(0).standard_normal(clips * CLIP_DURATION * SAMPLE_RATE)
+        audio = (noise * 0.05).astype(np.float32)
+    windows = [(i * CLIP_DURATION, (i + 1) * CLIP_DURATION) for i in range(clips)]
+    # Wrap around short recordings so every upload has the same amount of audio
+    duration = len(audio) / SAMPLE_RATE
+    return [
+        slice_audio(audio, start % duration, min(start % duration + CLIP_DURATION, duration))
+        for start, _ in windows
+    ]
+
+
+def run_uploads(transcribe_upload, clips, requests):
+    """Runs requests concurrent uploads; returns (elapsed, sorted upload latencies)."""
+
+    def upload(_):
+        start = time.perf_counter()
+        transcribe_upload(clips)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as uploads:
+        latencies = sorted(uploads.map(upload, range(requests)))
+    return time.perf_counter() - started, latencies
+
+
+def report(label, elapsed, latencies, clip_count, stats=None):
+    line = (
+        f"{label:<40} {clip_count / elapsed:7.2f} clips/s  "
+        f"upload p50 {latencies[len(latencies) // 2]:6.2f}s  max {latencies[-1]:6.2f}s"
+    )
+    if stats:
+        line += (
+            f"  batch {stats['mean_batch_size'] or 0:5.2f}"
+            f"  clip p50 {stats['clip_latency_p50'] or 0:6.2f}s"
+            f"  p99 {stats['clip_latency_p99'] or 0:6.2f}s"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording", nargs="?")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queue-depth", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--clips", type=int, default=12)
+    args = parser.parse_args()
+
+    clips = clip_audio(args.recording, args.clips)
+    clip_count = args.requests * args.clips
+    print(
+        f"{args.requests} concurrent uploads x {args.clips} clips of {CLIP_DURATION}s, "
+        f"model '{DEFAULT_MODEL}', {os.cpu_count()} CPUs"
+    )
+
+    # Today's path: every request thread runs the shared model itself
+    model = get_model()
+    model.transcribe(clips[0], **OPTIONS)  # Warm up
+    elapsed, latencies = run_uploads(
+        lambda audios: [model.transcribe(audio, **OPTIONS) for audio in audios],
+        clips,
+        args.requests,
+    )
+    report("inline", elapsed, latencies, clip_count)
+
+    for workers, threads, depth, max_batch in itertools.product(
+        args.workers, args.threads, args.queue_depth, args.max_batch
+    ):
+        if workers * threads > (os.cpu_count() or 1) * 2:
+            continue  # Oversubscribed beyond any sensible setting
+        for affinity in (False, True):
+            pool = WhisperPool(
+                workers=workers,
+                threads=threads,
+                queue_depth=depth,
+                cpu_affinity=affinity,
+                max_batch=max_batch,
+                max_batch_wait_ms=args.max_wait_ms,
+            )
+            try:
+                # Keep model loading out of the measurement
+                while len(pool.stats()["worker_models"]) < workers:
+                    time.sleep(0.1)
+                pool.map(clips[:workers], **OPTIONS)
+                warm = pool.stats()
+                elapsed, latencies = run_uploads(
+                    lambda audios: pool.map(audios, **OPTIONS), clips, args.requests
+                )
+                stats = pool.stats()
+            finally:
+                pool.shutdown()
+            # Batch figures of the measured run only, without the warm-up
+            batches = stats["batches"] - warm["batches"]
+            stats["mean_batch_size"] = (
+                (stats["batched_clips"] - warm["batched_clips"]) / batches if batches else None
+            )
+            label = f"pool w={workers} t={threads} q={depth} b={max_batch}"
+            report(label + (" pinned" if affinity else ""), elapsed, latencies, clip_count, stats)
+
+
+if __name__ == "__main__":
+    main()
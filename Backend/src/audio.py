@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+
+from clips import run_ffmpeg
+
+SAMPLE_RATE = 16000  # What Whisper expects
+
+# Length of the frames the voice-activity detector measures, in seconds
+VAD_FRAME_SECONDS = 0.03
+# Frames this many dB above the recording's noise floor count as speech
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+# Frames below this level (dBFS) never count as speech, however quiet the room
+VAD_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-55"))
+# Frames above this level (dBFS) always count as speech, however loud the room
+VAD_SPEECH_DB = float(os.getenv("VAD_SPEECH_DB", "-35"))
+# Seconds of speech a clip needs before it is transcribed and sent to Hume
+VAD_MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", "0.3"))
+# Seconds into a pause beyond which a cut counts as clean; among clean cuts
+# the one nearest the target clip length wins
+PAUSE_DEPTH_SECONDS = 0.15
+
+
+def decode_audio(source, sample_rate=SAMPLE_RATE, sample_format="f32le") -> np.ndarray:
+    """
+    Decodes the audio track of a recording into a mono float32 NumPy array.
+
+    source is either a file path or the raw bytes of the recording, which are
+    piped to ffmpeg's stdin. ffmpeg's output is read straight from its stdout,
+    so no intermediate .wav is ever written. sample_format picks the PCM
+    encoding on the pipe: "f32le" (default) or "s16le", which halves the pipe
+    traffic at 16-bit precision.
+    """
+    if sample_format not in ("f32le", "s16le"):
+        raise ValueError(f"Unsupported sample format: {sample_format}")
+
+    from_pipe = isinstance(source, (bytes, bytearray, memoryview))
+    command = ["ffmpeg", "-v", "error"]
+    if not from_pipe:
+        command += ["-nostdin"]
+    command += [
+        "-i",
+        "pipe:0" if from_pipe else source,
+        "-vn",
+        "-ac",
+        "1",  # Convert to mono
+        "-ar",
+        str(sample_rate),
+        "-f",
+        sample_format,
+        "pipe:1",
+    ]
+    output = run_ffmpeg(command, input=bytes(source) if from_pipe else None).stdout
+
+    if sample_format == "s16le":
+        return np.frombuffer(output, dtype=np.int16).astype(np.float32) / 32768.0
+    return np.frombuffer(output, dtype=np.float32)
+
+
+def slice_audio(audio, start_time, end_time, sample_rate=SAMPLE_RATE):
+    """Returns the samples between start_time and end_time (seconds) without copying."""
+    return audio[int(start_time * sample_rate) : int(end_time * sample_rate)]
+
+
+def frame_levels(audio, sample_rate=SAMPLE_RATE, frame_seconds=VAD_FRAME_SECONDS):
+    """Returns the RMS level in dBFS of every frame_seconds frame of audio."""
+    frame = max(1, int(frame_seconds * sample_rate))
+    count = audio.shape[0] // frame
+    frames = audio[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_frames(audio, sample_rate=SAMPLE_RATE, frame_seconds=VAD_FRAME_SECONDS):
+    """
+    Marks the frames of audio that carry speech, by energy alone.
+
+    The threshold sits VAD_THRESHOLD_DB above the recording's noise floor
+    (its 10th-percentile frame level), kept between VAD_FLOOR_DB and
+    VAD_SPEECH_DB so neither a silent room nor a recording without pauses
+    moves it somewhere useless.
+    """
+    return speech_levels(frame_levels(audio, sample_rate, frame_seconds))
+
+
+def speech_levels(levels):
+    """speech_frames() for frame levels already measured with frame_levels()."""
+    if levels.shape[0] == 0:
+        return levels.astype(bool)
+    noise_floor = np.percentile(levels, 10)
+    threshold = min(max(noise_floor + VAD_THRESHOLD_DB, VAD_FLOOR_DB), VAD_SPEECH_DB)
+    return levels > threshold
+
+
+def silent_windows(
+    audio,
+    windows,
+    sample_rate=SAMPLE_RATE,
+    min_speech_seconds=VAD_MIN_SPEECH_SECONDS,
+    frame_seconds=VAD_FRAME_SECONDS,
+):
+    """
+    Returns, for every (start, end) window in seconds, whether it holds less
+    than min_speech_seconds of speech.
+    """
+    if not windows:
+        return []
+    speech = speech_frames(audio, sample_rate, frame_seconds)
+    speech_before = np.concatenate(([0], np.cumsum(speech)))
+    bounds = np.array(windows, dtype=np.float64) / frame_seconds
+    starts = np.clip(np.floor(bounds[:, 0]).astype(np.int64), 0, speech.shape[0])
+    ends = np.clip(np.ceil(bounds[:, 1]).astype(np.int64), 0, speech.shape[0])
+    speech_seconds = (speech_before[ends] - speech_before[starts]) * frame_seconds
+    return (speech_seconds < min_speech_seconds).tolist()
+
+
+def pause_depths(speech):
+    """
+    Returns, for every frame, how many frames deep it lies in a pause: the
+    distance to the nearer edge of its run of non-speech frames, counting
+    from 1, and 0 for speech frames.
+    """
+    count = speech.shape[0]
+    index = np.arange(count)
+    previous_speech = np.maximum.accumulate(np.where(speech, index, -1))
+    next_speech = np.minimum.accumulate(np.where(speech, index, count)[::-1])[::-1]
+    depth = np.minimum(index - previous_speech, next_speech - index)
+    return np.where(speech, 0, depth)
+
+
+def pause_windows(
+    audio,
+    target_seconds,
+    min_seconds,
+    max_seconds,
+    sample_rate=SAMPLE_RATE,
+    frame_seconds=VAD_FRAME_SECONDS,
+):
+    """
+    Splits the recording into contiguous (start, end) windows from 0 with
+    every cut placed in a pause, so no word is cut in half.
+
+    Each cut lies between min_seconds and max_seconds after the previous
+    one (and at least min_seconds before the end). Within that range the
+    deepest pause wins, any pause deeper than PAUSE_DEPTH_SECONDS counts as
+    equally good, and ties go to the cut nearest target_seconds. A range
+    without any pause is cut at its quietest frame.
+    """
+    duration = audio.shape[0] / sample_rate
+    if duration <= 0:
+        return []
+    levels = frame_levels(audio, sample_rate, frame_seconds)
+    depths = np.minimum(
+        pause_depths(speech_levels(levels)) * frame_seconds, PAUSE_DEPTH_SECONDS
+    )
+    last_frame = levels.shape[0] - 1
+
+    windows = []
+    start = 0.0
+    while duration - start > max_seconds and last_frame >= 0:
+        lo = start + min_seconds
+        hi = max(lo, min(start + max_seconds, duration - min_seconds))
+        first = min(int(np.ceil(lo / frame_seconds)), last_frame)
+        last = max(first, min(int(hi / frame_seconds), last_frame))
+        times = np.arange(first, last + 1) * frame_seconds
+        candidate_depths = depths[first : last + 1]
+        if candidate_depths.max() > 0:
+            best = np.flatnonzero(candidate_depths == candidate_depths.max())
+            best = best[np.argmin(np.abs(times[best] - (start + target_seconds)))]
+        else:
+            best = np.argmin(levels[first : last + 1])
+        cut = round(float(times[best]), 2)
+        if cut <= start:
+            break
+        windows.append((start, cut))
+        start = cut
+    windows.append((start, round(duration, 2)))
+    return windows
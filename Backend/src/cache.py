@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "calhacks_result_cache"
+)
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Files without a result older than this are left over from a crash and deleted
+ORPHAN_SECONDS = 3600
+
+
+def cache_key(content_hash, config):
+    """Combines an upload's content hash with the pipeline config that produced the result."""
+    config_json = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{content_hash}:{config_json}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk LRU of JSON results, one file per key.
+
+    An entry can also own attachments: files written next to its JSON
+    (at attachment_path(key, suffix)) before the result is put, such as the
+    FACS series a result points at. They count toward the entry's size and
+    are deleted with it, so max_bytes bounds everything the cache stores.
+
+    Recency is kept in memory and mirrored to file mtimes, so the order
+    survives a restart. When the total size goes over max_bytes the least
+    recently used entries are deleted.
+    """
+
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # Key -> size in bytes, least recently used first
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        files = {}  # Key -> [file names]
+        for name in os.listdir(directory):
+            files.setdefault(name.split(".", 1)[0], []).append(name)
+        existing = []
+        for key, names in files.items():
+            if f"{key}.json" not in names:
+                # Attachments whose result was never put, or a stray .tmp;
+                # recent ones may still be on their way into the cache
+                if all(
+                    time.time() - os.stat(os.path.join(directory, name)).st_mtime
+                    > ORPHAN_SECONDS
+                    for name in names
+                ):
+                    self._remove_files(key)
+                continue
+            mtime = os.stat(self._path(key)).st_mtime
+            existing.append((mtime, key, self._entry_size(key)))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def attachment_path(self, key, suffix):
+        """
+        Where a file belonging to key's entry is stored, or None for
+        anything but a cache key (so user-supplied ids can't escape the
+        directory).
+        """
+        if not isinstance(key, str) or not re.fullmatch(r"[0-9a-f]{64}", key):
+            return None
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def _entry_files(self, key):
+        prefix = f"{key}."
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.startswith(prefix)
+        ]
+
+    def _entry_size(self, key):
+        size = 0
+        for path in self._entry_files(key):
+            try:
+                size += os.stat(path).st_size
+            except OSError:
+                pass
+        return size
+
+    def _remove_files(self, key):
+        for path in self._entry_files(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Returns the cached result for key, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key)) as f:
+                    result = json.load(f)
+                os.utime(self._path(key))
+            except (OSError, ValueError):
+                # Deleted or corrupted behind our back
+                self._total_bytes -= self._entries.pop(key)
+                self._remove_files(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        data = json.dumps(result).encode()
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+
+            # Write then rename so readers never see a half-written entry
+            with tempfile.NamedTemporaryFile(
+                "wb", dir=self.directory, suffix=".tmp", delete=False
+            ) as f:
+                f.write(data)
+            os.replace(f.name, self._path(key))
+            size = self._entry_size(key)
+            self._entries[key] = size
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                self.evictions += 1
+                self._remove_files(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
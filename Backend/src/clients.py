@@ -0,0 +1,141 @@
+import asyncio
+import atexit
+import os
+import threading
+
+import httpx
+from groq import Groq
+from hume import AsyncHumeClient
+
+# Connection pool shared by every request to the same API
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HUME_TIMEOUT = float(os.getenv("HUME_TIMEOUT", "60"))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+# Point these at a local stand-in to run without the real services
+HUME_BASE_URL = os.getenv("HUME_BASE_URL") or None
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+_lock = threading.Lock()
+_loop = None
+_loop_thread = None
+_hume_client = None
+_hume_http = None
+_groq_client = None
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def bind_client_loop(loop):
+    """
+    Makes loop the client loop. Under an ASGI server this is the worker's
+    serving loop, so requests use the shared clients without a thread hop;
+    only code on other loops hands coroutines over to it.
+    """
+    global _loop
+    with _lock:
+        if _loop is not None and _loop is not loop:
+            raise RuntimeError("The client loop is already running")
+        _loop = loop
+
+
+def client_loop():
+    """
+    Returns the long-lived event loop the async clients live on.
+
+    Pooled async connections belong to the loop that opened them. Unless a
+    serving loop was bound with bind_client_loop, the shared clients run on
+    one background loop, and callers hand their coroutines to it.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="client-loop", daemon=True
+            )
+            _loop_thread.start()
+        return _loop
+
+
+async def on_client_loop(coro):
+    """Awaits coro on the shared client loop, from it or from any other loop."""
+    if asyncio.get_running_loop() is client_loop():
+        return await coro
+    return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(coro, client_loop())
+    )
+
+
+def run_on_client_loop(coro, timeout=None):
+    """Runs coro on the shared client loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, client_loop()).result(timeout)
+
+
+def get_hume_client() -> AsyncHumeClient:
+    """Returns the application-wide Hume client; only use it on client_loop()."""
+    global _hume_client, _hume_http
+    with _lock:
+        if _hume_client is None:
+            _hume_http = httpx.AsyncClient(limits=_pool_limits(), timeout=HUME_TIMEOUT)
+            _hume_client = AsyncHumeClient(
+                api_key=os.getenv("API_KEY"),
+                base_url=HUME_BASE_URL,
+                timeout=HUME_TIMEOUT,
+                httpx_client=_hume_http,
+            )
+        return _hume_client
+
+
+def get_groq_client() -> Groq:
+    """Returns the application-wide Groq client (thread-safe, synchronous)."""
+    global _groq_client
+    with _lock:
+        if _groq_client is None:
+            _groq_client = Groq(
+                api_key=os.getenv("GROQ_KEY"),
+                base_url=GROQ_BASE_URL,
+                timeout=GROQ_TIMEOUT,
+                http_client=httpx.Client(limits=_pool_limits(), timeout=GROQ_TIMEOUT),
+            )
+        return _groq_client
+
+
+async def close_clients():
+    """Closes the pooled connections from a bound client loop, e.g. on server shutdown."""
+    global _loop, _hume_client, _hume_http, _groq_client
+    with _lock:
+        hume_http, groq_client = _hume_http, _groq_client
+        _loop = _hume_client = _hume_http = _groq_client = None
+
+    if groq_client is not None:
+        groq_client.close()
+    if hume_http is not None:
+        await hume_http.aclose()
+
+
+def shutdown_clients():
+    """Closes the pooled connections and stops the background client loop."""
+    global _loop, _loop_thread, _hume_client, _hume_http, _groq_client
+    with _lock:
+        loop, loop_thread = _loop, _loop_thread
+        hume_http, groq_client = _hume_http, _groq_client
+        _loop = _loop_thread = _hume_client = _hume_http = _groq_client = None
+
+    if groq_client is not None:
+        groq_client.close()
+    # A bound serving loop belongs to the server; only stop our own
+    if loop is not None and loop_thread is not None:
+        if hume_http is not None:
+            asyncio.run_coroutine_threadsafe(hume_http.aclose(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown_clients)
@@ -0,0 +1,320 @@
+import glob
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pools import submit_windowed
+
+# Keyframes closer than this to a clip boundary are good enough to cut on
+KEYFRAME_TOLERANCE = 0.1
+# Codecs we can stream copy into an .mp4 clip without re-encoding
+COPYABLE_VIDEO_CODECS = {"h264"}
+
+# Upper bound on ffmpeg children across all requests in this process
+FFMPEG_MAX_CHILDREN = int(os.getenv("FFMPEG_MAX_CHILDREN", str(os.cpu_count() or 4)))
+# How many clips a single request may encode at once
+CLIP_WORKERS_PER_REQUEST = int(os.getenv("CLIP_WORKERS_PER_REQUEST", "4"))
+
+# "face" encodes clips for the face model only (small, few frames, no
+# audio); "source" keeps the recording's resolution, frame rate and audio
+CLIP_ENCODING = os.getenv("CLIP_ENCODING", "face")
+# Clip height in pixels for the face model; smaller recordings keep theirs
+FACE_VIDEO_HEIGHT = int(os.getenv("FACE_VIDEO_HEIGHT", "360"))
+# Frames per second kept for the face model (Hume predicts at 3 by default)
+FACE_VIDEO_FPS = float(os.getenv("FACE_VIDEO_FPS", "3"))
+# Video bitrate cap for the face model, in kbit/s
+FACE_VIDEO_KBPS = int(os.getenv("FACE_VIDEO_KBPS", "250"))
+
+_ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_MAX_CHILDREN)
+# Each worker thread only babysits one ffmpeg child process, so the encoding
+# itself runs on as many cores as there are children
+_clip_pool = ThreadPoolExecutor(
+    max_workers=FFMPEG_MAX_CHILDREN, thread_name_prefix="clip-encoder"
+)
+
+
+class ClipExtractionError(Exception):
+    """Raised when one or more clips could not be written."""
+
+    def __init__(self, errors):
+        self.errors = errors  # [(clip index, (start, end), message)]
+        details = "; ".join(
+            f"clip {index} ({start}-{end}s): {message}"
+            for index, (start, end), message in errors
+        )
+        super().__init__(f"{len(errors)} clip(s) failed: {details}")
+
+
+def run_ffmpeg(command, input=None):
+    """Runs an ffmpeg/ffprobe command once a global child slot is free."""
+    with _ffmpeg_slots:
+        return subprocess.run(command, input=input, check=True, capture_output=True)
+
+
+def clip_windows(duration, clip_duration=5):
+    """Returns the (start, end) windows split_video_into_clips has always produced."""
+    return [
+        (start_time, min(start_time + clip_duration, duration))
+        for start_time in range(0, int(duration), clip_duration)
+    ]
+
+
+def probe_video(video_file_path):
+    """
+    Probes the upload once with ffprobe for its duration, codecs and video keyframes.
+
+    Only packets are read (no decoding), so this is cheap even for long recordings.
+    Browser recordings often carry no container duration, in which case the last
+    packet timestamp is used instead.
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration:stream=index,codec_type,codec_name:packet=stream_index,pts_time,duration_time,flags",
+        "-show_streams",
+        "-show_packets",
+        "-of",
+        "json",
+        video_file_path,
+    ]
+    output = run_ffmpeg(command).stdout
+    info = json.loads(output)
+
+    streams = info.get("streams", [])
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio_stream = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    keyframes = []
+    last_packet_end = 0.0
+    for packet in info.get("packets", []):
+        if packet.get("pts_time") in (None, "N/A"):
+            continue
+        pts_time = float(packet["pts_time"])
+        packet_duration = packet.get("duration_time")
+        if packet_duration not in (None, "N/A"):
+            pts_time += float(packet_duration)
+        last_packet_end = max(last_packet_end, pts_time)
+        if (
+            video_stream is not None
+            and packet.get("stream_index") == video_stream["index"]
+            and "K" in packet.get("flags", "")
+        ):
+            keyframes.append(float(packet["pts_time"]))
+
+    duration = info.get("format", {}).get("duration")
+    duration = float(duration) if duration not in (None, "N/A") else last_packet_end
+
+    return {
+        "duration": duration,
+        "video_codec": video_stream["codec_name"] if video_stream else None,
+        "has_audio": audio_stream is not None,
+        "keyframes": sorted(keyframes),
+    }
+
+
+def face_video_codec(cut_times):
+    """ffmpeg output options encoding video for the face model at FACE_VIDEO_*."""
+    return [
+        "-vf",
+        f"scale=-2:'min({FACE_VIDEO_HEIGHT},ih)',fps={FACE_VIDEO_FPS:g}",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-pix_fmt",
+        "yuv420p",
+        "-b:v",
+        f"{FACE_VIDEO_KBPS}k",
+        "-maxrate",
+        f"{FACE_VIDEO_KBPS}k",
+        "-bufsize",
+        f"{2 * FACE_VIDEO_KBPS}k",
+        "-force_key_frames",
+        cut_times or "0",
+    ]
+
+
+def can_stream_copy(probe, windows):
+    """True when the video codec fits in .mp4 and a keyframe sits on every cut."""
+    if probe["video_codec"] not in COPYABLE_VIDEO_CODECS:
+        return False
+    keyframes = probe["keyframes"]
+    for _, end_time in windows[:-1]:
+        if not any(abs(k - end_time) <= KEYFRAME_TOLERANCE for k in keyframes):
+            return False
+    return True
+
+
+def split_with_ffmpeg(
+    video_file_path, output_dir, clip_duration=5, write_audio=False, windows=None
+):
+    """
+    Cuts the upload into clips with the ffmpeg segment muxer in a single subprocess.
+
+    The clips are fixed clip_duration windows unless windows, contiguous
+    (start, end) pairs from 0, gives the cuts explicitly.
+    With CLIP_ENCODING "face" the clips are re-encoded small for the face
+    model and carry no audio. Otherwise video is stream copied when
+    keyframes line up with the clip boundaries and re-encoded with a fast
+    preset (forcing keyframes on the boundaries) when they don't.
+    Per-clip .wav files are only written when write_audio is set.
+    Returns (clip_windows, video_file_paths, audio_file_paths).
+    """
+    probe = probe_video(video_file_path)
+    if windows is None:
+        windows = clip_windows(probe["duration"], clip_duration)
+    if not windows:
+        return [], [], []
+
+    cut_times = ",".join(str(end_time) for _, end_time in windows[:-1])
+    face_only = CLIP_ENCODING == "face"
+    if face_only:
+        video_codec = face_video_codec(cut_times)
+    elif can_stream_copy(probe, windows):
+        video_codec = ["-c:v", "copy"]
+    else:
+        video_codec = [
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-force_key_frames",
+            cut_times or "0",
+        ]
+
+    video_pattern = os.path.join(output_dir, "video_%d.mp4")
+    audio_pattern = os.path.join(output_dir, "audio_%d.wav")
+    segment_options = [
+        "-t",
+        str(windows[-1][1]),
+        "-f",
+        "segment",
+        "-reset_timestamps",
+        "1",
+    ]
+    if cut_times:
+        segment_options += ["-segment_times", cut_times]
+    else:
+        segment_options += ["-segment_time", str(windows[0][1] + 1)]
+
+    command = ["ffmpeg", "-y", "-v", "error", "-i", video_file_path]
+    command += ["-map", "0:v:0", *video_codec]
+    if probe["has_audio"] and not face_only:
+        command += ["-map", "0:a:0", "-c:a", "aac"]
+    command += [*segment_options, "-segment_format", "mp4", video_pattern]
+    if probe["has_audio"] and write_audio:
+        command += ["-map", "0:a:0", "-vn", "-ac", "1", "-ar", "16000"]
+        command += [*segment_options, audio_pattern]
+
+    run_ffmpeg(command)  # Raises CalledProcessError on failure
+
+    video_file_paths = _numbered_outputs(output_dir, "video_", ".mp4")
+    audio_file_paths = _numbered_outputs(output_dir, "audio_", ".wav")
+
+    # Stream copy can leave a sliver of a segment past the last window, or
+    # merge a short tail; keep clips and windows index-aligned either way
+    count = min(len(windows), len(video_file_paths))
+    for path in video_file_paths[count:] + audio_file_paths[count:]:
+        os.remove(path)
+
+    return windows[:count], video_file_paths[:count], audio_file_paths[:count]
+
+
+def encode_clip(
+    video_file_path, output_dir, index, start_time, end_time, has_audio=True, write_audio=False
+):
+    """
+    Writes one clip's video, encoded per CLIP_ENCODING (and optionally a
+    16 kHz mono .wav), with one ffmpeg child.
+    """
+    vid_file_path = os.path.join(output_dir, f"video_{index}.mp4")
+    audio_file_path = os.path.join(output_dir, f"audio_{index}.wav")
+    command = ["ffmpeg", "-y", "-v", "error"]
+    command += ["-ss", str(start_time), "-t", str(end_time - start_time)]
+    command += ["-i", video_file_path, "-map", "0:v:0"]
+    if CLIP_ENCODING == "face":
+        command += face_video_codec("0")
+    else:
+        command += ["-c:v", "libx264", "-preset", "veryfast"]
+    if has_audio and CLIP_ENCODING != "face":
+        command += ["-map", "0:a:0", "-c:a", "aac"]
+    command += [vid_file_path]
+    write_audio = write_audio and has_audio
+    if write_audio:
+        command += ["-map", "0:a:0", "-vn", "-ac", "1", "-ar", "16000", audio_file_path]
+
+    run_ffmpeg(command)
+    return vid_file_path, audio_file_path if write_audio else None
+
+
+def split_in_parallel(
+    video_file_path,
+    output_dir,
+    clip_duration=5,
+    max_workers=None,
+    write_audio=False,
+    windows=None,
+):
+    """
+    Encodes every clip as its own ffmpeg child, fanned out over the shared pool.
+
+    The clips are fixed clip_duration windows unless windows gives them.
+
+    At most max_workers (CLIP_WORKERS_PER_REQUEST) clips of this request are in
+    flight at once, and at most FFMPEG_MAX_CHILDREN ffmpeg processes run in total.
+    Results come back in clip order; failures are collected per clip and raised
+    together as a ClipExtractionError once every clip has finished.
+    """
+    max_workers = max_workers or CLIP_WORKERS_PER_REQUEST
+    probe = probe_video(video_file_path)
+    if windows is None:
+        windows = clip_windows(probe["duration"], clip_duration)
+
+    outputs = [None] * len(windows)
+    errors = []
+    clips = [
+        (
+            video_file_path,
+            output_dir,
+            index,
+            start_time,
+            end_time,
+            probe["has_audio"],
+            write_audio,
+        )
+        for index, (start_time, end_time) in enumerate(windows)
+    ]
+    for index, future in submit_windowed(_clip_pool, encode_clip, clips, max_workers):
+        try:
+            outputs[index] = future.result()
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.decode(errors="replace").strip() or str(e)
+            errors.append((index, windows[index], message))
+        except Exception as e:
+            errors.append((index, windows[index], str(e)))
+
+    if errors:
+        for output in outputs:
+            for path in output or ():
+                if path and os.path.exists(path):
+                    os.remove(path)
+        raise ClipExtractionError(sorted(errors))
+
+    video_file_paths = [vid_file_path for vid_file_path, _ in outputs]
+    audio_file_paths = [
+        audio_file_path for _, audio_file_path in outputs if audio_file_path
+    ]
+    return windows, video_file_paths, audio_file_paths
+
+
+def _numbered_outputs(output_dir, prefix, suffix):
+    """Returns prefix_N.suffix files in output_dir ordered by N."""
+    paths = glob.glob(os.path.join(output_dir, f"{prefix}*{suffix}"))
+    return sorted(
+        paths,
+        key=lambda path: int(os.path.basename(path)[len(prefix) : -len(suffix)]),
+    )
@@ -0,0 +1,187 @@
+import os
+
+import numpy as np
+
+# How many FACS units to keep per clip
+TOP_FACS_K = int(os.getenv("TOP_FACS_K", "3"))
+
+
+def facs_matrix(prediction):
+    """
+    Returns (scores, unit_names, times) for one file's face predictions, where
+    scores is a frames x units float32 matrix with one row per predicted frame
+    (of every detected face) and times holds each row's offset in seconds.
+    """
+    face = prediction.models.face
+    frames = [
+        frame
+        for grouped_preds in (face.grouped_predictions if face else [])
+        for frame in grouped_preds.predictions
+        if frame.facs
+    ]
+    if not frames:
+        return np.zeros((0, 0), dtype=np.float32), [], np.zeros(0)
+    times = np.array([frame.time or 0.0 for frame in frames], dtype=np.float64)
+
+    unit_names = [facs_score.name for facs_score in frames[0].facs]
+    # Hume returns every unit in the same order for every frame; reading the
+    # names of every frame would cost as much as reading the scores, so only
+    # the lengths are checked everywhere and the names at a few sample frames
+    samples = (frames[len(frames) // 2], frames[-1])
+    if all(len(frame.facs) == len(unit_names) for frame in frames) and all(
+        [facs_score.name for facs_score in frame.facs] == unit_names for frame in samples
+    ):
+        scores = np.array(
+            [[facs_score.score for facs_score in frame.facs] for frame in frames],
+            dtype=np.float32,
+        )
+        return scores, unit_names, times
+
+    # Fall back to scattering by name when frames disagree on the unit list
+    unit_index = {name: i for i, name in enumerate(unit_names)}
+    for frame in frames:
+        for facs_score in frame.facs:
+            if facs_score.name not in unit_index:
+                unit_index[facs_score.name] = len(unit_names)
+                unit_names.append(facs_score.name)
+    scores = np.zeros((len(frames), len(unit_names)), dtype=np.float32)
+    for row, frame in enumerate(frames):
+        for facs_score in frame.facs:
+            scores[row, unit_index[facs_score.name]] = facs_score.score
+    return scores, unit_names, times
+
+
+def top_k_units(scores, k=TOP_FACS_K):
+    """Returns (unit indices, mean scores) of the k highest-mean units, best first."""
+    means = scores.mean(axis=0)
+    k = min(k, means.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp), means
+    top = np.argpartition(-means, k - 1)[:k]
+    return top[np.argsort(-means[top], kind="stable")], means
+
+
+def get_top_facs(predictions, k=TOP_FACS_K):
+    """
+    Returns the k FACS units with the highest mean score in every clip, as a
+    flat list of (facs_name, score, file) tuples in clip order.
+    """
+    top_facs_per_clip = []  # List to hold results for all clips
+
+    for pred in predictions:  # Each file
+        if pred.results is None:
+            continue
+        for prediction in pred.results.predictions:  # Per file
+            scores, unit_names, _ = facs_matrix(prediction)
+            if scores.shape[0] == 0:
+                continue  # No face found in this clip
+
+            top, means = top_k_units(scores, k)
+            top_facs_per_clip.extend(
+                (unit_names[i], float(means[i]), prediction.file) for i in top
+            )
+
+    return top_facs_per_clip
+
+
+class FacsSeries:
+    """
+    Per-frame FACS scores for a whole recording, kept for later report queries.
+
+    scores is a frames x units float32 matrix, timestamps the sorted time of
+    each row in seconds from the start of the recording, and unit_names the
+    column labels. Time windows are located by binary search, so a query
+    costs O(log n) plus the size of the window.
+    """
+
+    def __init__(self, scores, timestamps, unit_names):
+        order = np.argsort(timestamps, kind="stable")
+        self.scores = np.asarray(scores, dtype=np.float32)[order]
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)[order]
+        self.unit_names = list(unit_names)
+        self.unit_index = {name: i for i, name in enumerate(self.unit_names)}
+
+    @classmethod
+    def from_predictions(cls, predictions, clip_offsets):
+        """
+        Builds the series from Hume batch predictions. clip_offsets maps each
+        uploaded clip's file name to its start time in the recording.
+        """
+        unit_names = []
+        unit_index = {}
+        blocks = []
+        for pred in predictions:
+            if pred.results is None:
+                continue
+            for prediction in pred.results.predictions:
+                scores, names, times = facs_matrix(prediction)
+                if scores.shape[0] == 0:
+                    continue
+                for name in names:
+                    if name not in unit_index:
+                        unit_index[name] = len(unit_names)
+                        unit_names.append(name)
+                offset = clip_offsets.get(os.path.basename(prediction.file), 0.0)
+                blocks.append((scores, [unit_index[name] for name in names], times + offset))
+
+        total = sum(scores.shape[0] for scores, _, _ in blocks)
+        matrix = np.zeros((total, len(unit_names)), dtype=np.float32)
+        timestamps = np.zeros(total, dtype=np.float64)
+        row = 0
+        for scores, columns, times in blocks:
+            matrix[row : row + scores.shape[0], columns] = scores
+            timestamps[row : row + scores.shape[0]] = times
+            row += scores.shape[0]
+        return cls(matrix, timestamps, unit_names)
+
+    def __len__(self):
+        return self.timestamps.shape[0]
+
+    def window(self, start=None, end=None):
+        """Returns (scores, timestamps) for frames with start <= time < end."""
+        lo = 0 if start is None else np.searchsorted(self.timestamps, start, "left")
+        hi = len(self) if end is None else np.searchsorted(self.timestamps, end, "left")
+        return self.scores[lo:hi], self.timestamps[lo:hi]
+
+    def top_k(self, start=None, end=None, k=TOP_FACS_K):
+        """Returns [(unit_name, mean score)] of the k strongest units in the window."""
+        scores, _ = self.window(start, end)
+        if scores.shape[0] == 0:
+            return []
+        top, means = top_k_units(scores, k)
+        return [(self.unit_names[i], float(means[i])) for i in top]
+
+    def rolling_mean(self, window_seconds, units=None, start=None, end=None):
+        """
+        Returns (timestamps, means) where each row is the mean of the frames
+        in the trailing window_seconds up to and including that frame.
+        """
+        scores, timestamps = self.window(start, end)
+        if units is not None:
+            scores = scores[:, [self.unit_index[name] for name in units]]
+        sums = np.zeros((scores.shape[0] + 1, scores.shape[1]), dtype=np.float64)
+        np.cumsum(scores, axis=0, out=sums[1:])
+        first = np.searchsorted(timestamps, timestamps - window_seconds, "right")
+        last = np.arange(1, scores.shape[0] + 1)
+        counts = (last - first)[:, None]
+        return timestamps, ((sums[last] - sums[first]) / counts).astype(np.float32)
+
+    def save(self, path):
+        np.savez(
+            path,
+            scores=self.scores,
+            timestamps=self.timestamps,
+            unit_names=np.array(self.unit_names),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["scores"], data["timestamps"], data["unit_names"].tolist())
+
+
+def load_series(path):
+    """Returns the series stored at path, or None if there is none."""
+    if path is None or not os.path.exists(path):
+        return None
+    return FacsSeries.load(path)
@@ -0,0 +1,424 @@
+import json
+import math
+import os
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from pools import submit_windowed
+
+FEEDBACK_MODEL = os.getenv("FEEDBACK_MODEL", "llama-3.1-8b-instant")
+# Completions in flight at once for one /api/postFeedback request
+FEEDBACK_CONCURRENCY = int(os.getenv("FEEDBACK_CONCURRENCY", "4"))
+# Seconds allowed for a single question's completion
+FEEDBACK_TIMEOUT = float(os.getenv("FEEDBACK_TIMEOUT", "20"))
+# Completions in flight at once across all requests
+FEEDBACK_POOL_SIZE = int(os.getenv("FEEDBACK_POOL_SIZE", "16"))
+# "per_question" (one completion per question) or "batched" (one for all)
+FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "per_question")
+# Seconds allowed for the single completion in batched mode
+FEEDBACK_BATCH_TIMEOUT = float(os.getenv("FEEDBACK_BATCH_TIMEOUT", "60"))
+FEEDBACK_MODES = ("per_question", "batched")
+# Rough prompt size estimate for reporting; Groq bills Llama tokens, which
+# average about four characters of English or JSON
+CHARS_PER_TOKEN = 4
+
+SYSTEM_PROMPT = """
+                                The response should be strictly less than 70 words. You are an interview coach.
+                                Your task is to evaluate the performance and give specific feedback on how the user
+                                performs on a specific question. Make your performance assessment based on a variety of data
+                                sources including facial expressions, quality and depth of answers, and emotions.
+                                Outline both strengths and weaknesses of the user including ways to improve. Be extremely thorough and specific in your feedback.
+                                Here is an example output that the response MUST adhere to: 
+                                Question: question verbatim. 
+                                User's Response to Question: over here describe how well or not the user 
+                                answered the question.
+                                Emotion: Over here describe the top 3 emotions expressed by the user.
+                                Behavior: Over here describe the top 3 facial expressions shown by the user.
+                                Score: Finally here output a score out of 100 combining all 3 metrics above.
+                                """
+
+BATCH_SYSTEM_PROMPT = """
+You are an interview coach. You are given every question of an interview together with
+the user's transcript, facial expressions (behaviors) and emotions. Whatever is shared by
+every question is given once; the rest is given separately for the time each question
+was being answered.
+For EACH question, evaluate the performance and give specific feedback strictly less than
+70 words long, based on facial expressions, quality and depth of the answer, and emotions.
+Outline both strengths and weaknesses of the user including ways to improve.
+Each feedback MUST adhere to this format:
+Question: question verbatim.
+User's Response to Question: over here describe how well or not the user answered the question.
+Emotion: Over here describe the top 3 emotions expressed by the user.
+Behavior: Over here describe the top 3 facial expressions shown by the user.
+Score: Finally here output a score out of 100 combining all 3 metrics above.
+Reply with a JSON object only, of the form
+{"feedback": [{"index": <question number>, "feedback": "<feedback text>"}, ...]}
+with exactly one entry per question number.
+"""
+
+_feedback_pool = ThreadPoolExecutor(
+    max_workers=FEEDBACK_POOL_SIZE, thread_name_prefix="feedback"
+)
+
+
+def build_messages(question, context):
+    """
+    The chat messages asking for feedback on a single question, where
+    context is a dict with the transcript, behaviors and emotions to judge.
+    """
+    transcript, behaviors, emotions = (
+        context["transcript"],
+        context["behaviors"],
+        context["emotions"],
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+                Questions: {question},
+                Transcript: {transcript},
+                Behaviors: {behaviors},
+                Emotions: {emotions} 
+                """,
+        },
+    ]
+
+
+def unavailable_feedback(error):
+    """Stands in for a question's feedback when its completion failed."""
+    return f"Feedback for this question is unavailable: {error}"
+
+
+def question_feedback(client, question, context, timeout=FEEDBACK_TIMEOUT):
+    chat_completion = client.with_options(timeout=timeout).chat.completions.create(
+        messages=build_messages(question, context),
+        model=FEEDBACK_MODEL,
+    )
+    return chat_completion.choices[0].message.content
+
+
+def generate_feedback(
+    client,
+    questions,
+    contexts,
+    max_concurrency=FEEDBACK_CONCURRENCY,
+    timeout=FEEDBACK_TIMEOUT,
+):
+    """
+    Asks the LLM for feedback on every question concurrently, judging each
+    question on its entry of contexts (see question_contexts).
+
+    At most max_concurrency completions of this request run at once, each
+    limited to timeout seconds. Returns (answers, errors) in question order;
+    a question whose completion failed gets a placeholder answer and its
+    error message, the others get None in errors.
+    """
+    answers = [None] * len(questions)
+    errors = [None] * len(questions)
+    calls = [
+        (client, question, context, timeout) for question, context in zip(questions, contexts)
+    ]
+    for index, future in submit_windowed(
+        _feedback_pool, question_feedback, calls, max_concurrency
+    ):
+        try:
+            answers[index] = future.result()
+        except Exception as e:
+            print(f"Feedback for question {index} failed: {e}")
+            errors[index] = str(e)
+            answers[index] = unavailable_feedback(e)
+
+    return answers, errors
+
+
+def build_batch_messages(questions, contexts):
+    """
+    The chat messages asking for feedback on all questions at once. Context
+    fields that are the same for every question (all of them without
+    question timing) are included once for the whole batch; each question
+    is listed with only the fields sliced to its answer window.
+    """
+    fields = ("transcript", "behaviors", "emotions")
+    shared = [
+        field
+        for field in fields
+        if all(context[field] == contexts[0][field] for context in contexts)
+    ]
+    own = [field for field in fields if field not in shared]
+
+    lines = []
+    if shared:
+        lines.append("Shared by every question:")
+        lines += [f"{field.capitalize()}: {contexts[0][field]}" for field in shared]
+    lines.append("Questions:")
+    for i, (question, context) in enumerate(zip(questions, contexts)):
+        lines.append(f"{i}. {question}")
+        lines += [f"{field.capitalize()}: {context[field]}" for field in own]
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": "\n".join(lines)},
+    ]
+
+
+def parse_batch_feedback(content, question_count):
+    """
+    Returns {question index: feedback} for every well-formed entry of a
+    batched reply. Malformed, duplicate or out-of-range entries are left out.
+    """
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    entries = payload.get("feedback") if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        return {}
+
+    parsed = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        index, text = entry.get("index"), entry.get("feedback")
+        if (
+            isinstance(index, int)
+            and not isinstance(index, bool)
+            and 0 <= index < question_count
+            and index not in parsed
+            and isinstance(text, str)
+            and text.strip()
+        ):
+            parsed[index] = text.strip()
+    return parsed
+
+
+def generate_feedback_batched(
+    client,
+    questions,
+    contexts,
+    timeout=FEEDBACK_BATCH_TIMEOUT,
+):
+    """
+    Asks the LLM for feedback on every question in one completion, sharing
+    an interview-wide context once instead of once per question. Questions
+    missing from the reply or with unparseable entries fall back to
+    per-question completions. Returns (answers, errors) like
+    generate_feedback.
+    """
+    if not questions:
+        return [], []
+
+    parsed = {}
+    try:
+        chat_completion = client.with_options(timeout=timeout).chat.completions.create(
+            messages=build_batch_messages(questions, contexts),
+            model=FEEDBACK_MODEL,
+            response_format={"type": "json_object"},
+        )
+        parsed = parse_batch_feedback(
+            chat_completion.choices[0].message.content, len(questions)
+        )
+        if chat_completion.usage is not None:
+            print(f"Batched feedback prompt tokens: {chat_completion.usage.prompt_tokens}")
+    except Exception as e:
+        print(f"Batched feedback failed: {e}")
+
+    answers = [parsed.get(i) for i in range(len(questions))]
+    errors = [None] * len(questions)
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        print(f"Falling back to per-question feedback for questions {missing}")
+        fallback_answers, fallback_errors = generate_feedback(
+            client, [questions[i] for i in missing], [contexts[i] for i in missing]
+        )
+        for i, answer, error in zip(missing, fallback_answers, fallback_errors):
+            answers[i] = answer
+            errors[i] = error
+    return answers, errors
+
+
+def question_windows(question_times, count):
+    """
+    Returns the [start, end) answer window in seconds of each of the first
+    count questions: from when it was asked until the next question was.
+    Returns None when the client sent no usable timing.
+    """
+    if not isinstance(question_times, list) or len(question_times) < count:
+        return None
+    try:
+        starts = [float(time) for time in question_times[:count]]
+    except (TypeError, ValueError):
+        return None
+    if starts != sorted(starts):
+        return None
+    ends = [float(time) for time in question_times[1:count]] + [math.inf]
+    return list(zip(starts, ends))
+
+
+def slice_transcript(transcript, start, end):
+    """
+    The [{clip_end_time: text}] entries of transcript whose clips overlap
+    [start, end). Each clip runs from the previous clip's end time to its own.
+    """
+    sliced = []
+    clip_start = 0.0
+    for clip in transcript:
+        for key, text in clip.items():
+            clip_end = float(key)
+            if clip_start < end and clip_end > start:
+                sliced.append({key: text})
+            clip_start = clip_end
+    return sliced
+
+
+def slice_emotions(emotions, start, end):
+    """The [{timestamp, emotions}] entries with start <= timestamp < end."""
+    sliced = []
+    for entry in emotions:
+        try:
+            timestamp = float(entry["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if start <= timestamp < end:
+            sliced.append(entry)
+    return sliced
+
+
+def question_contexts(
+    questions,
+    transcript,
+    behaviors,
+    emotions,
+    question_times=None,
+    series=None,
+    compact_emotions=None,
+):
+    """
+    Returns one context dict (transcript, behaviors, emotions) per question.
+
+    With question timing from the client each question only sees the
+    transcript clips and emotion readings from its answer window, plus the
+    window's strongest FACS units when the recording's FacsSeries is given
+    (behaviors are whole-interview averages otherwise). Without timing every
+    question shares one context holding everything.
+
+    compact_emotions(readings, windows), when given, shrinks each context's
+    emotion readings for the prompt once they are sliced, where windows is
+    how many answer windows the interview was split into (1 without timing).
+    """
+    windows = question_windows(question_times, len(questions))
+    if windows is None or not isinstance(transcript, list):
+        if compact_emotions is not None and isinstance(emotions, list):
+            emotions = compact_emotions(emotions, 1)
+        full_context = {"transcript": transcript, "behaviors": behaviors, "emotions": emotions}
+        return [full_context] * len(questions)
+
+    contexts = []
+    for start, end in windows:
+        window_emotions = emotions
+        if isinstance(emotions, list):
+            window_emotions = slice_emotions(emotions, start, end)
+            if compact_emotions is not None:
+                window_emotions = compact_emotions(window_emotions, len(windows))
+        contexts.append(
+            {
+                "transcript": slice_transcript(transcript, start, end),
+                "behaviors": (
+                    dict(series.top_k(start, end)) if series is not None else behaviors
+                ),
+                "emotions": window_emotions,
+            }
+        )
+    return contexts
+
+
+def estimate_tokens(messages):
+    return sum(math.ceil(len(message["content"]) / CHARS_PER_TOKEN) for message in messages)
+
+
+def prompt_tokens(questions, contexts, mode):
+    """Estimated prompt tokens of all completions a feedback mode would send."""
+    if not questions:
+        return 0
+    if mode == "batched":
+        return estimate_tokens(build_batch_messages(questions, contexts))
+    return sum(
+        estimate_tokens(build_messages(question, context))
+        for question, context in zip(questions, contexts)
+    )
+
+
+def feedback_score(feedback):
+    """
+    The "Score: N" a question's feedback ends with, read the way the Report
+    page reads it, or None when there is none.
+    """
+    match = re.search(r"score:\s*(\d+)", feedback.lower())
+    return int(match.group(1)) if match else None
+
+
+def stream_question_feedback(client, index, question, context, events, timeout):
+    """Streams one question's completion, putting token events on events."""
+    pieces = []
+    try:
+        stream = client.with_options(timeout=timeout).chat.completions.create(
+            messages=build_messages(question, context),
+            model=FEEDBACK_MODEL,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                pieces.append(delta)
+                events.put({"type": "token", "index": index, "delta": delta})
+        events.put({"type": "feedback", "index": index, "feedback": "".join(pieces), "error": None})
+    except Exception as e:
+        print(f"Feedback for question {index} failed: {e}")
+        events.put(
+            {
+                "type": "feedback",
+                "index": index,
+                "feedback": unavailable_feedback(e),
+                "error": str(e),
+            }
+        )
+
+
+def stream_feedback(
+    client,
+    questions,
+    contexts,
+    max_concurrency=FEEDBACK_CONCURRENCY,
+    timeout=FEEDBACK_TIMEOUT,
+):
+    """
+    Generator over feedback events as the completions stream in: "token"
+    events carry each piece of text as the LLM produces it, and one
+    "feedback" event per question carries its full text (or placeholder and
+    error) once it is done. Questions finish in any order; every event has
+    the question's index. Concurrency and timeouts are as in
+    generate_feedback.
+    """
+    events = queue.Queue()
+    next_index = 0
+    in_flight = 0
+    finished = 0
+    while finished < len(questions):
+        while next_index < len(questions) and in_flight < max_concurrency:
+            _feedback_pool.submit(
+                stream_question_feedback,
+                client,
+                next_index,
+                questions[next_index],
+                contexts[next_index],
+                events,
+                timeout,
+            )
+            next_index += 1
+            in_flight += 1
+
+        event = events.get()
+        if event["type"] == "feedback":
+            in_flight -= 1
+            finished += 1
+        yield event
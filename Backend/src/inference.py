@@ -0,0 +1,569 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+
+import numpy as np
+
+from pools import percentiles
+
+# Whisper worker processes; 0 transcribes inline in the calling thread
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+# torch intra-op threads per worker
+WHISPER_WORKER_THREADS = int(
+    os.getenv(
+        "WHISPER_WORKER_THREADS",
+        str(max(1, (os.cpu_count() or 1) // max(WHISPER_WORKERS, 1))),
+    )
+)
+# Transcriptions submitted but not finished; submit() blocks beyond this
+WHISPER_QUEUE_DEPTH = int(os.getenv("WHISPER_QUEUE_DEPTH", "64"))
+# Pin each worker to its own WHISPER_WORKER_THREADS cores
+WHISPER_CPU_AFFINITY = os.getenv("WHISPER_CPU_AFFINITY", "0") == "1"
+# Seconds submit() waits for room in the queue before raising InferenceQueueFull
+WHISPER_SUBMIT_TIMEOUT = float(os.getenv("WHISPER_SUBMIT_TIMEOUT", "300"))
+# Seconds map() and transcribe() wait for a result before giving up on it
+WHISPER_RESULT_TIMEOUT = float(os.getenv("WHISPER_RESULT_TIMEOUT", "600"))
+# Seconds between checks for dead workers, however busy the result queue is
+WORKER_CHECK_INTERVAL = 1.0
+# Most clips decoded in one batched encoder/decoder pass
+WHISPER_MAX_BATCH = int(os.getenv("WHISPER_MAX_BATCH", "16"))
+# Milliseconds a worker holding a clip waits for more to fill its batch
+WHISPER_MAX_BATCH_WAIT_MS = float(os.getenv("WHISPER_MAX_BATCH_WAIT_MS", "20"))
+
+# transcribe() options a batched decode reproduces; anything else runs alone
+BATCHABLE_OPTIONS = {"task", "language"}
+# Whisper's window: clips up to 30 s of 16 kHz audio fit one decode
+WINDOW_SAMPLES = 30 * 16000
+# Per-clip latencies kept for the percentiles in stats()
+LATENCY_SAMPLES = 1024
+# transcribe()'s default thresholds, applied the same way to batched decodes
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class InferenceQueueFull(Exception):
+    """Raised when WHISPER_QUEUE_DEPTH transcriptions stay in flight too long."""
+
+
+class WorkerCrashed(Exception):
+    """Raised for a transcription whose worker process died while running it."""
+
+
+class TranscriptionTimedOut(Exception):
+    """Raised for a transcription whose result didn't arrive within the timeout."""
+
+
+def worker_cpus(index, threads):
+    """The cores worker index is pinned to: its own block of threads cores."""
+    cpus = sorted(os.sched_getaffinity(0))
+    start = (index * threads) % len(cpus)
+    return {cpus[(start + i) % len(cpus)] for i in range(min(threads, len(cpus)))}
+
+
+def batch_key(audio, options):
+    """
+    The (task, language) a clip is batched under, or None when only
+    transcribe() handles it: file paths, clips longer than one window, or
+    options (word timestamps, prompts, ...) a plain decode doesn't apply.
+    """
+    if not isinstance(audio, np.ndarray) or audio.shape[0] > WINDOW_SAMPLES:
+        return None
+    if not set(options) <= BATCHABLE_OPTIONS:
+        return None
+    return options.get("task", "transcribe"), options.get("language")
+
+
+def decode_batch(model, audios, task="transcribe", language=None):
+    """
+    Decodes clips of at most one window each in a single batched pass:
+    one encoder forward over every log-mel window, then one batched greedy
+    decode. Each log-mel is padded the way transcribe() pads its first
+    window and the results are filtered with transcribe()'s thresholds, so
+    the text matches the per-clip path. Clips transcribe() would retry at a
+    higher temperature come back as None for the caller to transcribe; the
+    others as {"text", "segments": [], "language"}.
+    """
+    import torch
+    import whisper
+    from whisper.audio import N_FRAMES, N_SAMPLES
+    from whisper.tokenizer import get_tokenizer
+
+    mels = []
+    for audio in audios:
+        mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+        content_frames = mel.shape[-1] - N_FRAMES
+        mels.append(whisper.pad_or_trim(mel[:, :content_frames], N_FRAMES))
+    options = whisper.DecodingOptions(
+        task=task, language=language, fp16=model.device.type != "cpu"
+    )
+    decoded = whisper.decode(model, torch.stack(mels).to(model.device), options)
+
+    tokenizer = get_tokenizer(
+        model.is_multilingual, num_languages=model.num_languages, task=task
+    )
+    results = []
+    for result in decoded:
+        silent = result.no_speech_prob > NO_SPEECH_THRESHOLD
+        if not silent and (
+            result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+            or result.avg_logprob < LOGPROB_THRESHOLD
+        ):
+            results.append(None)
+        elif silent and result.avg_logprob <= LOGPROB_THRESHOLD:
+            results.append({"text": "", "segments": [], "language": result.language})
+        else:
+            results.append(
+                {
+                    "text": tokenizer.decode(result.tokens),
+                    "segments": [],
+                    "language": result.language,
+                }
+            )
+    return results
+
+
+def transcribe_batch(items, get_model):
+    """
+    Transcribes [(model name, audio, options)] items, decoding the batchable
+    ones together per model and (task, language). Returns
+    ([Whisper result or exception per item], [clips in each batched decode],
+    number of items that went through transcribe() instead).
+    """
+    outcomes = [None] * len(items)
+    groups = {}
+    for i, (model_name, audio, options) in enumerate(items):
+        key = batch_key(audio, options)
+        if key is not None:
+            groups.setdefault((model_name, *key), []).append(i)
+
+    batch_sizes = []
+    for (model_name, task, language), indexes in groups.items():
+        try:
+            decoded = decode_batch(
+                get_model(model_name), [items[i][1] for i in indexes], task, language
+            )
+        except Exception as e:
+            print(f"Batched decode of {len(indexes)} clips failed, transcribing one by one: {e}")
+            continue
+        batch_sizes.append(len(indexes))
+        for i, result in zip(indexes, decoded):
+            outcomes[i] = result
+
+    transcribed = 0
+    for i, (model_name, audio, options) in enumerate(items):
+        if outcomes[i] is None:
+            transcribed += 1
+            try:
+                outcomes[i] = get_model(model_name).transcribe(audio, **options)
+            except Exception as e:
+                outcomes[i] = e
+    return outcomes, batch_sizes, transcribed
+
+
+def _next_batch(tasks, max_batch, max_wait, running, slots):
+    """
+    Blocks for one task, then collects more until max_batch are in hand or
+    max_wait seconds have passed. Returns (tasks, whether to stop after them).
+    Each task's id goes into its running slot as soon as it is taken.
+    """
+    task = tasks.get()
+    if task is None:
+        return [], True
+    # Shared memory, not a message: it must survive the worker dying mid-batch
+    running[slots[0]] = task[0]
+    batch = [task]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch:
+        try:
+            task = tasks.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        if task is None:
+            return batch, True
+        running[slots[len(batch)]] = task[0]
+        batch.append(task)
+    return batch, False
+
+
+def _worker_main(
+    index, threads, cpus, model_names, max_batch, max_wait, tasks, results, running
+):
+    """
+    Runs in a worker process: pins threads and cores, loads the models,
+    then transcribes batches of tasks until it receives None.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    import model_registry
+
+    for name in model_names:
+        model_registry.get_model(name)
+    results.put(("ready", index, model_registry.model_stats()))
+
+    slots = range(index * max_batch, (index + 1) * max_batch)
+    while True:
+        batch, stop = _next_batch(tasks, max_batch, max_wait, running, slots)
+        outcomes, batch_sizes, transcribed = transcribe_batch(
+            [(model_name, audio, options) for _, model_name, audio, options in batch],
+            model_registry.get_model,
+        )
+        for (task_id, *_), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                results.put(("error", index, task_id, f"{type(outcome).__name__}: {outcome}"))
+            else:
+                results.put(("done", index, task_id, outcome))
+        if batch:
+            results.put(("batch", index, batch_sizes, transcribed))
+
+        for slot in slots:
+            running[slot] = -1
+        if stop:
+            return
+
+
+class WhisperPool:
+    """
+    A fixed set of worker processes, each holding warm Whisper models.
+
+    Transcription is CPU-bound torch work, so it runs outside the serving
+    process, with every worker's torch thread count pinned (and optionally
+    its cores) so workers don't oversubscribe the machine. Tasks go out
+    through one shared queue, so whichever worker is free takes the next
+    clips: up to max_batch of them, from any upload, waiting at most
+    max_batch_wait_ms for the batch to fill, decoded in one batched pass.
+    A collector thread resolves each task's Future when its result comes
+    back and, every WORKER_CHECK_INTERVAL seconds, restarts workers that
+    died, failing only the tasks the dead worker was running. A task lost
+    before its worker could record it is caught by the result timeout of
+    map() and transcribe().
+    """
+
+    def __init__(
+        self,
+        workers=WHISPER_WORKERS,
+        threads=WHISPER_WORKER_THREADS,
+        queue_depth=WHISPER_QUEUE_DEPTH,
+        cpu_affinity=WHISPER_CPU_AFFINITY,
+        max_batch=WHISPER_MAX_BATCH,
+        max_batch_wait_ms=WHISPER_MAX_BATCH_WAIT_MS,
+        model_names=None,
+    ):
+        if model_names is None:
+            import model_registry
+
+            model_names = [model_registry.DEFAULT_MODEL]
+
+        self.workers = workers
+        self.threads = threads
+        self.queue_depth = queue_depth
+        self.cpu_affinity = cpu_affinity and hasattr(os, "sched_setaffinity")
+        self.max_batch = max(1, max_batch)
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.model_names = list(model_names)
+        self.default_model = self.model_names[0]
+
+        # spawn, not fork: the serving process has threads and maybe torch state
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._pending = {}  # Task id -> (Future, submitted_at)
+        # max_batch slots per worker: ids of the tasks it is transcribing, -1 when free
+        self._running = self._context.Array("q", [-1] * (workers * self.max_batch), lock=False)
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)  # Seconds from submit to result
+        self._processes = [None] * workers
+        self._ready = set()  # Indexes of workers that have loaded their models
+        self._start_failures = 0  # Workers in a row that died before getting ready
+        self._next_restart = 0.0
+        self._worker_stats = {}
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "restarts": 0,
+            "batches": 0,
+            "batched_clips": 0,
+            "largest_batch": 0,
+            # Clips run through transcribe(): not batchable, or retried
+            "transcribed_alone": 0,
+        }
+        self._closed = False
+
+        for index in range(workers):
+            self._start_worker(index)
+        self._collector = threading.Thread(
+            target=self._collect, name="whisper-pool-collector", daemon=True
+        )
+        self._collector.start()
+
+    def submit(self, audio, model=None, timeout=WHISPER_SUBMIT_TIMEOUT, **options):
+        """
+        Queues audio (16 kHz float32 samples or a file path) for
+        model.transcribe(audio, **options) and returns a Future of the
+        Whisper result. Blocks while queue_depth tasks are in flight.
+        """
+        if self._closed:
+            raise RuntimeError("The Whisper pool is shut down")
+        if not self._slots.acquire(timeout=timeout):
+            raise InferenceQueueFull(
+                f"{self.queue_depth} transcriptions in flight for {timeout}s"
+            )
+        future = Future()
+        with self._lock:
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (future, time.perf_counter())
+        self._tasks.put((task_id, model or self.default_model, audio, options))
+        return future
+
+    async def transcribe(
+        self, audio, model=None, timeout=WHISPER_RESULT_TIMEOUT, **options
+    ):
+        """Awaits the Whisper result for audio without blocking the event loop."""
+        future = await asyncio.to_thread(self.submit, audio, model, **options)
+        try:
+            # Shielded, so the timeout doesn't cancel the task's Future under us
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            self._expire([future], timeout)
+            return future.result()
+
+    def map(self, audios, model=None, timeout=WHISPER_RESULT_TIMEOUT, **options):
+        """
+        Transcribes every audio in parallel across workers; results in order.
+        Raises TranscriptionTimedOut if they aren't all back within timeout
+        seconds.
+        """
+        futures = [self.submit(audio, model, **options) for audio in audios]
+        _, not_done = wait(futures, timeout)
+        if not_done:
+            self._expire(not_done, timeout)
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            latencies = percentiles(self._latencies, (50, 99))
+            batches = self._stats["batches"]
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads,
+                "queue_depth": self.queue_depth,
+                "cpu_affinity": self.cpu_affinity,
+                "max_batch": self.max_batch,
+                "max_batch_wait_ms": self.max_batch_wait_ms,
+                "in_flight": len(self._pending),
+                **self._stats,
+                "mean_batch_size": (
+                    round(self._stats["batched_clips"] / batches, 2) if batches else None
+                ),
+                "clip_latency_p50": latencies["p50"],
+                "clip_latency_p99": latencies["p99"],
+                "worker_models": dict(self._worker_stats),
+            }
+
+    def shutdown(self, timeout=5):
+        """Stops the workers and fails whatever was still queued."""
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            future.set_exception(RuntimeError("The Whisper pool shut down"))
+            self._slots.release()
+
+    def _start_worker(self, index):
+        cpus = worker_cpus(index, self.threads) if self.cpu_affinity else None
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.threads,
+                cpus,
+                self.model_names,
+                self.max_batch,
+                self.max_batch_wait_ms / 1000,
+                self._tasks,
+                self._results,
+                self._running,
+            ),
+            name=f"whisper-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _expire(self, futures, timeout):
+        """Gives up on tasks whose results are overdue, freeing their queue slots."""
+        futures = set(futures)
+        with self._lock:
+            task_ids = [
+                task_id for task_id, (future, _) in self._pending.items() if future in futures
+            ]
+        for task_id in task_ids:
+            self._resolve(
+                None,
+                task_id,
+                error=TranscriptionTimedOut(f"No Whisper result after {timeout}s"),
+            )
+
+    def _collect(self):
+        next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+        while not self._closed:
+            # Liveness is checked on a timer, not only when results stop
+            # coming, so one busy worker can't hide another one's crash
+            if time.monotonic() >= next_check:
+                self._restart_dead_workers()
+                next_check = time.monotonic() + WORKER_CHECK_INTERVAL
+            try:
+                message = self._results.get(timeout=max(next_check - time.monotonic(), 0))
+            except queue.Empty:
+                continue
+            kind, index = message[0], message[1]
+            if kind == "ready":
+                with self._lock:
+                    self._ready.add(index)
+                    self._start_failures = 0
+                    self._worker_stats[index] = message[2]
+            elif kind == "done":
+                self._resolve(index, message[2], result=message[3])
+            elif kind == "error":
+                self._resolve(index, message[2], error=RuntimeError(message[3]))
+            elif kind == "batch":
+                batch_sizes, transcribed = message[2], message[3]
+                with self._lock:
+                    self._stats["batches"] += len(batch_sizes)
+                    self._stats["batched_clips"] += sum(batch_sizes)
+                    self._stats["largest_batch"] = max(
+                        [self._stats["largest_batch"], *batch_sizes]
+                    )
+                    self._stats["transcribed_alone"] += transcribed
+
+    def _resolve(self, index, task_id, result=None, error=None):
+        with self._lock:
+            future, submitted_at = self._pending.pop(task_id, (None, None))
+            if future is None:
+                return
+            self._stats["failed" if error else "completed"] += 1
+            self._latencies.append(time.perf_counter() - submitted_at)
+        self._slots.release()
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _restart_dead_workers(self):
+        for index, process in enumerate(self._processes):
+            if self._closed or process is None or process.is_alive():
+                continue
+            if time.monotonic() < self._next_restart:
+                return
+            print(f"Whisper worker {index} exited with code {process.exitcode}, restarting")
+            with self._lock:
+                slots = range(index * self.max_batch, (index + 1) * self.max_batch)
+                task_ids = [self._running[slot] for slot in slots if self._running[slot] >= 0]
+                for slot in slots:
+                    self._running[slot] = -1
+                self._worker_stats.pop(index, None)
+                self._stats["restarts"] += 1
+                was_ready = index in self._ready
+                self._ready.discard(index)
+                if not was_ready:
+                    self._start_failures += 1
+                    # Back off while workers can't even load a model
+                    self._next_restart = time.monotonic() + min(2**self._start_failures, 60)
+                    stranded = [] if self._ready else list(self._pending)
+                else:
+                    stranded = []
+            for task_id in task_ids:
+                self._resolve(
+                    index,
+                    task_id,
+                    error=WorkerCrashed(f"Whisper worker {index} died mid-transcription"),
+                )
+            # With no worker able to start, nothing would ever pick queued tasks up
+            for stranded_id in stranded:
+                self._resolve(
+                    index,
+                    stranded_id,
+                    error=WorkerCrashed(f"Whisper worker {index} failed to start"),
+                )
+            self._start_worker(index)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide WhisperPool, starting it on first use, or None when WHISPER_WORKERS is 0."""
+    global _pool
+    if WHISPER_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = WhisperPool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def pool_stats():
+    with _pool_lock:
+        return _pool.stats() if _pool is not None else None
+
+
+def transcribe(audio, **options):
+    """Runs model.transcribe(audio, **options) on the pool, or inline without one."""
+    return transcribe_many([audio], **options)[0]
+
+
+def transcribe_many(audios, **options):
+    """
+    Transcribes every audio and returns the Whisper results in order. On the
+    pool they are spread across workers and batched with other uploads'
+    clips; inline they are decoded WHISPER_MAX_BATCH at a time.
+    """
+    pool = get_pool()
+    if pool is not None:
+        return pool.map(audios, **options)
+
+    from model_registry import get_model
+
+    model_name = options.pop("model", None)
+    results = []
+    for start in range(0, len(audios), WHISPER_MAX_BATCH):
+        outcomes, _, _ = transcribe_batch(
+            [(model_name, audio, options) for audio in audios[start : start + WHISPER_MAX_BATCH]],
+            get_model,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                raise outcome
+            results.append(outcome)
+    return results
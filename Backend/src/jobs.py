@@ -0,0 +1,182 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+
+# Jobs running at once; the rest wait their turn in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Jobs waiting or running at once; submissions beyond this are rejected
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "8"))
+# How long finished jobs (and their results) stay queryable
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested."""
+
+
+class QueueFull(Exception):
+    """Raised when JOB_QUEUE_DEPTH jobs are already waiting or running."""
+
+
+class Job:
+    """One submitted pipeline run and its per-stage progress."""
+
+    def __init__(self, stages):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued, running, completed, failed, cancelled
+        self.stages = {stage: "pending" for stage in stages}
+        self.current_stage = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed", "cancelled")
+
+    def start_stage(self, stage):
+        """Marks the previous stage done and the given one running."""
+        self.check_cancelled()
+        with self._lock:
+            if self.current_stage is not None:
+                self.stages[self.current_stage] = "done"
+            self.stages[stage] = "running"
+            self.current_stage = stage
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    async def run_cancellable(self, coro, check_interval=0.5):
+        """Awaits coro, cancelling it as soon as the job is cancelled."""
+        task = asyncio.ensure_future(coro)
+        while not task.done():
+            if self.cancelled:
+                task.cancel()
+                raise JobCancelled(f"Job {self.id} was cancelled")
+            await asyncio.wait({task}, timeout=check_interval)
+        return task.result()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.current_stage,
+                "stages": dict(self.stages),
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs pipeline jobs as tasks on the serving loop, at most workers at once.
+
+    At most max_queued jobs may be waiting or running at once, so a burst of
+    slow uploads is rejected up front instead of piling up behind each other.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_DEPTH, ttl=JOB_RESULT_TTL):
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(workers)
+
+    def submit(self, fn, *args, stages=(), on_finish=None):
+        """
+        Queues the coroutine function fn(job, *args) on the running loop and
+        returns the Job immediately.
+
+        on_finish(job) runs after the job ends however it ended, e.g. to
+        delete the files the job owned.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_queued:
+                raise QueueFull(f"{active} jobs already queued or running")
+            job = Job(stages)
+            self._jobs[job.id] = job
+            job.task = loop.create_task(self._run(job, fn, args))
+        if on_finish is not None:
+            # A callback rather than a finally in _run, since a task cancelled
+            # before it first runs never enters its coroutine
+            job.task.add_done_callback(lambda task: on_finish(job))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancels a queued job outright, or asks a running one to stop."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel_event.set()
+        if job.status == "queued":
+            # Still waiting for a slot, so nothing is left half done
+            self._finish(job, "cancelled", error="Cancelled before it started")
+            job.task.cancel()
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job._cancel_event.set()
+            if not job.task.done():
+                job.task.cancel()
+
+    async def _run(self, job, fn, args):
+        try:
+            async with self._slots:
+                with job._lock:
+                    job.status = "running"
+                    job.started_at = time.time()
+                job.check_cancelled()
+                result = await fn(job, *args)
+            self._finish(job, "completed", result=result)
+        except JobCancelled as e:
+            self._finish(job, "cancelled", error=str(e))
+        except asyncio.CancelledError:
+            if not job.finished:
+                self._finish(job, "cancelled", error=f"Job {job.id} was cancelled")
+            raise
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            self._finish(job, "failed", error=str(e))
+
+    def _finish(self, job, status, result=None, error=None):
+        with job._lock:
+            if job.current_stage is not None:
+                job.stages[job.current_stage] = "done" if status == "completed" else status
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
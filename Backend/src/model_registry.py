@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import whisper
+
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "base")
+MAX_LOADED_MODELS = int(os.getenv("WHISPER_MAX_MODELS", "2"))
+
+_models = OrderedDict()  # Model name -> loaded Whisper model, least recently used first
+_stats = {}  # Model name -> load time and memory figures
+_lock = threading.Lock()
+
+
+def _resident_bytes():
+    """Returns the current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # ru_maxrss is the peak (kilobytes on Linux), the best we can do without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _parameter_bytes(model):
+    """Returns the size of the model weights in bytes."""
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def get_model(name=None):
+    """
+    Returns the Whisper model of the given size, loading it at most once per process.
+
+    Loaded models are kept in LRU order; when more than WHISPER_MAX_MODELS sizes
+    are in use the least recently used one is evicted.
+    """
+    name = name or DEFAULT_MODEL
+
+    with _lock:
+        if name in _models:
+            _models.move_to_end(name)
+            _stats[name]["hits"] += 1
+            return _models[name]
+
+        rss_before = _resident_bytes()
+        start = time.perf_counter()
+        model = whisper.load_model(name)
+        load_seconds = time.perf_counter() - start
+
+        _models[name] = model
+        _stats[name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_bytes": _resident_bytes() - rss_before,
+            "parameter_bytes": _parameter_bytes(model),
+            "loaded_at": time.time(),
+            "hits": 0,
+        }
+        print(
+            f"Loaded Whisper model '{name}' in {load_seconds:.2f}s "
+            f"(+{_stats[name]['rss_delta_bytes'] / 2**20:.0f} MiB RSS)"
+        )
+
+        while len(_models) > MAX_LOADED_MODELS:
+            evicted, _ = _models.popitem(last=False)
+            _stats.pop(evicted, None)
+            print(f"Evicted Whisper model '{evicted}'")
+
+        return model
+
+
+def preload(names=None):
+    """Loads the given model sizes (default: WHISPER_PRELOAD or WHISPER_MODEL) up front."""
+    if names is None:
+        names = os.getenv("WHISPER_PRELOAD", DEFAULT_MODEL).split(",")
+    for name in names:
+        if name.strip():
+            get_model(name.strip())
+
+
+def evict(name=None):
+    """Drops one model size from the registry, or all of them when no name is given."""
+    with _lock:
+        names = [name] if name else list(_models)
+        for model_name in names:
+            _models.pop(model_name, None)
+            _stats.pop(model_name, None)
+
+
+def model_stats():
+    """Returns load time and memory figures for every resident model."""
+    with _lock:
+        return {
+            "resident_bytes": _resident_bytes(),
+            "models": {name: dict(stats) for name, stats in _stats.items()},
+        }
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import random
+import statistics
+import time
+from collections import deque
+
+from pools import percentiles
+
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "8"))
+# Each interval is randomly stretched or shrunk by up to this fraction
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.2"))
+
+# When set, Hume is asked to POST here as soon as a batch job finishes
+HUME_CALLBACK_URL = os.getenv("HUME_CALLBACK_URL") or None
+# Shared secret Hume echoes back in the callback URL's query string
+HUME_CALLBACK_TOKEN = os.getenv("HUME_CALLBACK_TOKEN") or None
+# Fallback poll interval for jobs that are expected to call back
+POLL_CALLBACK_FALLBACK_INTERVAL = float(os.getenv("POLL_CALLBACK_FALLBACK_INTERVAL", "10"))
+
+FINAL_STATUSES = ("COMPLETED", "FAILED")
+
+
+class HumeJobTimeout(Exception):
+    """Raised when a Hume batch job hasn't finished within the wait timeout."""
+
+
+def callback_url():
+    """The callback URL to register with new Hume jobs, or None if disabled."""
+    if HUME_CALLBACK_URL is None or HUME_CALLBACK_TOKEN is None:
+        return HUME_CALLBACK_URL
+    separator = "&" if "?" in HUME_CALLBACK_URL else "?"
+    return f"{HUME_CALLBACK_URL}{separator}token={HUME_CALLBACK_TOKEN}"
+
+
+class HumeJobPoller:
+    """
+    One polling loop for every outstanding Hume batch job.
+
+    Callers await wait(client, job_id); a single background task schedules
+    the polls of all tracked jobs, each running on its own so a slow one
+    holds up nobody else, and resolves each caller's future when its job
+    reaches a final state. Poll intervals adapt to how long recent jobs took: polls are
+    sparse while a job is unlikely to be done and tighten around the typical
+    completion time, with jitter so concurrent jobs don't poll in lockstep.
+    Jobs registered with a callback URL are only polled every
+    fallback_interval seconds, in case the callback never arrives; the
+    callback itself triggers an immediate poll through expedite().
+
+    All methods except stats() must run on the client event loop.
+    """
+
+    def __init__(
+        self,
+        min_interval=POLL_MIN_INTERVAL,
+        max_interval=POLL_MAX_INTERVAL,
+        jitter=POLL_JITTER,
+        fallback_interval=POLL_CALLBACK_FALLBACK_INTERVAL,
+    ):
+        self.min_interval = min_interval
+        self.fallback_interval = fallback_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.polls = 0
+        self.callbacks = 0
+        self._jobs = {}  # Job id -> tracking state
+        self._durations = deque(maxlen=200)  # Seconds from submission to completion
+        self._latencies = deque(maxlen=1000)  # Seconds from wait() to resolution
+        self._early_callbacks = deque(maxlen=100)  # Callbacks that beat wait()
+        self._in_flight = {}  # Job id -> its running poll task
+        self._task = None
+        self._wakeup = None
+
+    async def wait(self, client, job_id, timeout=None, expect_callback=False):
+        """Returns the job details once the job completes or fails."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            now = time.monotonic()
+            job = {
+                "client": client,
+                "future": asyncio.get_running_loop().create_future(),
+                "registered_at": now,
+                "expect_callback": expect_callback,
+            }
+            if job_id in self._early_callbacks:
+                self._early_callbacks.remove(job_id)
+                job["next_poll_at"] = now
+            else:
+                job["next_poll_at"] = now + self._next_interval(job, 0.0)
+            self._jobs[job_id] = job
+            self._ensure_running()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(job["future"]), timeout)
+        finally:
+            if not job["future"].done():
+                # Nobody is waiting any more; stop polling for it
+                self._jobs.pop(job_id, None)
+
+    def resolve(self, job_id, job_details):
+        """Resolves a tracked job with details obtained elsewhere (e.g. a callback)."""
+        job = self._jobs.pop(job_id, None)
+        if job is None or job["future"].done():
+            return False
+        self._record(job, job_details)
+        job["future"].set_result(job_details)
+        return True
+
+    def expedite(self, job_id):
+        """Polls a job right away, e.g. because Hume called back about it."""
+        self.callbacks += 1
+        job = self._jobs.get(job_id)
+        if job is None:
+            # The callback can arrive before the request starts waiting
+            self._early_callbacks.append(job_id)
+            return
+        job["next_poll_at"] = time.monotonic()
+        self._ensure_running()
+
+    def stats(self):
+        return {
+            "outstanding": len(self._jobs),
+            "in_flight": len(self._in_flight),
+            "polls": self.polls,
+            "callbacks": self.callbacks,
+            "completed": len(self._latencies),
+            "expected_duration": self._expected_duration(),
+            "queue_to_completion_seconds": percentiles(list(self._latencies)),
+        }
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        self._wakeup.set()  # Re-plan the sleep around the new job
+
+    def _expected_duration(self):
+        if len(self._durations) < 3:
+            return None
+        return statistics.median(self._durations)
+
+    def _interval(self, elapsed):
+        """Seconds until the next poll of a job that has been running for elapsed seconds."""
+        expected = self._expected_duration()
+        if expected is None:
+            # No history yet: start fast and back off gently
+            interval = self.min_interval + elapsed * 0.25
+        elif elapsed < expected:
+            # Halve the remaining gap, so the polls close in on the typical finish
+            interval = (expected - elapsed) / 2
+        else:
+            # Running long: back off in proportion to how late it is
+            interval = self.min_interval + (elapsed - expected) * 0.25
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _next_interval(self, job, elapsed):
+        if job["expect_callback"]:
+            return self.fallback_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return self._interval(elapsed)
+
+    def _record(self, job, job_details):
+        now = time.monotonic()
+        self._latencies.append(now - job["registered_at"])
+        state = job_details.state
+        created_ms = getattr(state, "created_timestamp_ms", None)
+        ended_ms = getattr(state, "ended_timestamp_ms", None)
+        if created_ms and ended_ms:
+            self._durations.append((ended_ms - created_ms) / 1000)
+        else:
+            self._durations.append(now - job["registered_at"])
+
+    async def _poll(self, job_id, job):
+        try:
+            job_details = await job["client"].expression_measurement.batch.get_job_details(
+                job_id
+            )
+        except Exception as e:
+            print(f"Polling job {job_id} failed: {e}")
+            job_details = None
+        finally:
+            self.polls += 1
+            self._in_flight.pop(job_id, None)
+            self._wakeup.set()  # Re-plan around this job's next poll
+
+        if job_details is not None and job_details.state.status in FINAL_STATUSES:
+            self.resolve(job_id, job_details)
+        elif job_id in self._jobs:
+            elapsed = time.monotonic() - job["registered_at"]
+            job["next_poll_at"] = time.monotonic() + self._next_interval(job, elapsed)
+
+    async def _run(self):
+        # Each due poll runs as its own task, so one slow get_job_details
+        # doesn't hold up the polls of every other job
+        while self._jobs:
+            now = time.monotonic()
+            for job_id, job in list(self._jobs.items()):
+                if job["next_poll_at"] <= now and job_id not in self._in_flight:
+                    self._in_flight[job_id] = asyncio.ensure_future(self._poll(job_id, job))
+
+            waiting = [
+                job["next_poll_at"]
+                for job_id, job in self._jobs.items()
+                if job_id not in self._in_flight
+            ]
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), min(waiting) - now if waiting else None
+                )
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,33 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def submit_windowed(executor, fn, items, max_in_flight):
+    """
+    Runs fn(*item) on executor for every tuple in items, keeping at most
+    max_in_flight of them submitted at once, so one request can't take over
+    a pool shared with others. Yields (index into items, future) for each
+    call as it finishes.
+    """
+    pending = {}
+    next_index = 0
+    while next_index < len(items) or pending:
+        # Keep this caller's window of in-flight calls full
+        while next_index < len(items) and len(pending) < max_in_flight:
+            pending[executor.submit(fn, *items[next_index])] = next_index
+            next_index += 1
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Nearest-rank percentiles of values, or None when there are none yet."""
+    if not values:
+        return {f"p{point}": None for point in points}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(len(ordered) * point / 100))
+        result[f"p{point}"] = round(ordered[index], 3)
+    return result
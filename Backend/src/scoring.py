@@ -0,0 +1,263 @@
+from itertools import chain
+
+import numpy as np
+
+# Per-unit weights of the FACS expressions Hume reports, keyed by upper-case name
+FACIAL_EXPRESSION_WEIGHTS = {
+    "AU43 EYE CLOSURE": -1,
+    "HAND OVER FOREHEAD": -1,
+    "AU54 HEAD DOWN": -1,
+    "HAND OVER MOUTH": -1,
+    "AU7 LIDS TIGHT": -1,
+    "AU12 LIP CORNER PULLER": 1,
+    "AU17 CHIN RAISER": 0,
+    "AU9 NOSE WRINKLE": -1,
+    "CRY": -2,
+    "SMILE": 1,
+    "LAUGH": 2,
+    "AU6 CHEEK RAISE": 1,
+    "AU53 HEAD UP": 0,
+    "AU19 TONGUE SHOW": 0,
+    "LICKING LIP": 0,
+    "AU37 LIP WIPE": 0,
+    "TENSE BROW LOWERER": -1,
+    "AU32 BITE": 0,
+    "AU10 UPPER LIP RAISER": 0,
+    "AU1 INNER BROW RAISE": -1,
+    "WIDE-EYED": 1,
+    "AU5 UPPER LID RAISE": 0,
+    "JAW DROP": -1,
+    "GASP": -1,
+    "AU27 MOUTH STRETCH": 0,  # Add more expressions as needed from the image
+}
+# Per-emotion weights of the EVI emotion readings
+EMOTION_WEIGHTS = {
+    "Admiration": 1,
+    "Adoration": 0,
+    "Aesthetic appreciation": 0,
+    "Amusement": 0,
+    "Anger": -2,
+    "Anxiety": -2,
+    "Awe": 0,
+    "Awkwardness": -1,
+    "Boredom": -1,
+    "Calmness": 1,
+    "Concentration": 1,
+    "Confusion": -1,
+    "Contemplation": 1,
+    "Contempt": -2,
+    "Contentment": 0,
+    "Craving": 0,
+    "Determination": 1,
+    "Desire": 0,
+    "Disappointment": -2,
+    "Disapproval": -1,
+    "Disgust": -2,
+    "Distress": -2,
+    "Doubt": -1,
+    "Ecstasy": 0,
+    "Embarrassment": -1,
+    "Empathetic pain": -1,
+    "Enthusiasm": 1,
+    "Entrancement": 0,
+    "Envy": -1,
+    "Excitement": 0,
+    "Fear": -2,
+    "Gratitude": 1,
+    "Guilt": -2,
+    "Horror": -2,
+    "Interest": 0,
+    "Joy": 0,
+    "Love": 0,
+    "Nostalgia": 0,
+    "Pain": -2,
+    "Pride": 1,
+    "Realization": 0,
+    "Relief": 0,
+    "Romance": 0,
+    "Sadness": -2,
+    "Sarcasm": -1,
+    "Satisfaction": 0,
+    "Shame": -2,
+    "Surprise(negative)": -1,
+    "Surprise(positive)": 0,
+    "Sympathy": 0,
+    "Tiredness": -1,
+    "Triumph": 0,
+}
+
+
+# Each component score is clamped to this range before they are added up
+COMPONENT_SCORE_RANGE = (0, 50)
+# Distinct reading key layouts remembered before the cache is reset
+MAX_CACHED_LAYOUTS = 256
+
+
+class _NameIndex(dict):
+    """
+    Name -> weight vector index, filled in on first lookup of each name, so
+    normalising a name (e.g. .upper()) runs once per distinct spelling
+    rather than once per reading.
+    """
+
+    def __init__(self, weights, normalise=None):
+        super().__init__()
+        self.positions = {name: i for i, name in enumerate(weights)}
+        self.unknown = len(self.positions)  # The trailing zero weight
+        self.normalise = normalise
+
+    def __missing__(self, name):
+        key = self.normalise(name) if self.normalise else name
+        index = self[name] = self.positions.get(key, self.unknown)
+        return index
+
+
+class _LayoutWeights(dict):
+    """
+    Reading key layout (tuple of names) -> the weights of those names, in
+    order, filled in on first lookup. EVI repeats the same layout in every
+    reading, so names are resolved once per layout rather than per reading.
+    """
+
+    def __init__(self, index, weights):
+        super().__init__()
+        self.index = index
+        self.weights = weights
+
+    def __missing__(self, names):
+        if len(self) >= MAX_CACHED_LAYOUTS:
+            self.clear()
+        positions = np.fromiter(
+            map(self.index.__getitem__, names), dtype=np.intp, count=len(names)
+        )
+        layout = self[names] = self.weights[positions]
+        return layout
+
+
+class ScoringEngine:
+    """
+    Interview scoring with the weight tables compiled once into NumPy vectors.
+
+    Readings are {name: prominence} dicts. The prominences of every reading
+    of a batch of interviews are flattened into one array, and next to it
+    the matching weights, looked up per distinct key layout (names without a
+    weight get 0). Scoring is then one multiply of the two arrays and one
+    np.bincount per component, with no Python loop over readings. Sums are
+    accumulated in reading order, so results are identical to adding the
+    readings up one by one.
+    """
+
+    def __init__(
+        self,
+        emotion_weights=EMOTION_WEIGHTS,
+        facial_expression_weights=FACIAL_EXPRESSION_WEIGHTS,
+    ):
+        self.emotion_index = _NameIndex(emotion_weights)
+        self.emotion_weights = np.array(
+            list(emotion_weights.values()) + [0], dtype=np.float64
+        )
+        # Expression names arrive in any case
+        self.expression_index = _NameIndex(facial_expression_weights, str.upper)
+        self.expression_weights = np.array(
+            list(facial_expression_weights.values()) + [0], dtype=np.float64
+        )
+        self._emotion_layouts = _LayoutWeights(self.emotion_index, self.emotion_weights)
+        self._expression_layouts = _LayoutWeights(
+            self.expression_index, self.expression_weights
+        )
+
+    @staticmethod
+    def _emotion_readings(emotions):
+        # Every dict value of an EVI reading ({"timestamp", "emotions"}) counts
+        for interval in emotions:
+            for emotion_data in interval.values():
+                if isinstance(emotion_data, dict):
+                    yield emotion_data
+
+    @staticmethod
+    def _expression_readings(facial_expressions):
+        # Anything but a dict in the list (including the keys of a plain
+        # dict passed instead of a list) counts for nothing
+        for interval in facial_expressions:
+            if isinstance(interval, dict):
+                yield interval
+
+    def emotion_scores(self, interviews_emotions):
+        """Weighted emotion sums of many interviews' EVI reading lists."""
+        return self._weighted_sums(
+            map(self._emotion_readings, interviews_emotions), self._emotion_layouts
+        )
+
+    def facial_expression_scores(self, interviews_expressions):
+        """Weighted expression sums of many interviews' expression dict lists."""
+        return self._weighted_sums(
+            map(self._expression_readings, interviews_expressions), self._expression_layouts
+        )
+
+    @staticmethod
+    def _weighted_sums(interviews_readings, layouts):
+        """Per-interview sums of weight * prominence over all readings."""
+        all_readings, reading_weights, counts = [], [], []
+        for readings in interviews_readings:
+            readings = list(readings)
+            weights = list(map(layouts.__getitem__, map(tuple, readings)))
+            all_readings.extend(readings)
+            reading_weights.extend(weights)
+            counts.append(sum(map(len, weights)))
+
+        total = sum(counts)
+        if not total:
+            return np.zeros(len(counts), dtype=np.float64)
+        values = np.fromiter(
+            chain.from_iterable(map(dict.values, all_readings)), dtype=np.float64, count=total
+        )
+        products = np.concatenate(reading_weights) * values
+        owners = np.repeat(np.arange(len(counts)), counts)
+        return np.bincount(owners, products, minlength=len(counts))
+
+    def score_interviews(self, interviews):
+        """
+        Final scores of many (emotions, facial_expressions) interviews: each
+        component clamped to COMPONENT_SCORE_RANGE, then added up.
+        """
+        interviews = list(interviews)
+        low, high = COMPONENT_SCORE_RANGE
+        emotional = self.emotion_scores([emotions for emotions, _ in interviews])
+        facial = self.facial_expression_scores([expressions for _, expressions in interviews])
+        return np.clip(emotional, low, high) + np.clip(facial, low, high)
+
+    def score_interview(self, emotions, facial_expressions):
+        return float(self.score_interviews([(emotions, facial_expressions)])[0])
+
+    def score_timeline(self, timeline, facial_expressions):
+        """
+        Final score of one interview whose emotions were already summed into
+        an EmotionTimeline. Equal to score_interview on the raw readings up
+        to floating point rounding.
+        """
+        low, high = COMPONENT_SCORE_RANGE
+        lookup = self.emotion_index.__getitem__
+        weights = self.emotion_weights[
+            np.fromiter(map(lookup, timeline.names), dtype=np.intp, count=len(timeline.names))
+        ]
+        emotional = float(timeline.sums.sum(axis=0) @ weights)
+        facial = float(self.facial_expression_scores([facial_expressions])[0])
+        return float(np.clip(emotional, low, high) + np.clip(facial, low, high))
+
+
+_default_engine = ScoringEngine()
+
+
+def score_interview(emotions, facial_expressions):
+    """Final score of one interview with the default weight tables."""
+    return _default_engine.score_interview(emotions, facial_expressions)
+
+
+def score_interviews(interviews):
+    """Final scores of many (emotions, facial_expressions) interviews."""
+    return _default_engine.score_interviews(interviews)
+
+
+def score_timeline(timeline, facial_expressions):
+    """Final score of one interview from its EmotionTimeline."""
+    return _default_engine.score_timeline(timeline, facial_expressions)
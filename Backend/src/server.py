@@ -1,184 +1,350 @@
-import io
 import os
-import tempfile
 import asyncio
-from flask import Flask, request, jsonify
+import time
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, Response, request, jsonify
+from quart.utils import run_sync_iterable
 from datetime import datetime
 from dotenv import load_dotenv
+
+# Load .env before the modules below read their settings at import time
+load_dotenv()
+
 from hume import AsyncHumeClient
 from hume.expression_measurement.batch import Face, Models
 from hume.expression_measurement.batch.types import InferenceBaseRequest
 import json
-from transcription import extract_video_audio
-from groq import Groq
-
-GROQ_KEY = os.getenv("GROQ_KEY")
-API_KEY = os.getenv("API_KEY")
-
-load_dotenv()
+from transcription import (
+    CLIP_DURATION,
+    CLIP_MAX_SECONDS,
+    CLIP_MIN_SECONDS,
+    CLIP_SEGMENTATION,
+    MAX_CLIPS_PER_JOB,
+    SKIP_SILENT_CLIPS,
+    TRANSCRIBE_MODE,
+    clip_start_times,
+    extract_video_audio,
+    remove_clip_files,
+)
+from clips import CLIP_ENCODING, FACE_VIDEO_FPS, FACE_VIDEO_HEIGHT, FACE_VIDEO_KBPS
+from audio import (
+    VAD_FLOOR_DB,
+    VAD_MIN_SPEECH_SECONDS,
+    VAD_SPEECH_DB,
+    VAD_THRESHOLD_DB,
+)
+from uploads import (
+    MAX_UPLOAD_BYTES,
+    BackpressureHTTPConnection,
+    StreamingUploadRequest,
+    detach_upload,
+    remove_scratch_files,
+    scratch_path,
+    upload_digest,
+)
+from jobs import JobManager, QueueFull
+from cache import ResultCache, cache_key
+import inference
+import model_registry
+from clients import (
+    bind_client_loop,
+    client_loop,
+    close_clients,
+    get_groq_client,
+    get_hume_client,
+    on_client_loop,
+)
+from poller import HUME_CALLBACK_TOKEN, HumeJobPoller, HumeJobTimeout, callback_url
+from feedback import (
+    FEEDBACK_MODE,
+    FEEDBACK_MODES,
+    feedback_score,
+    generate_feedback,
+    generate_feedback_batched,
+    prompt_tokens,
+    question_contexts,
+    stream_feedback,
+)
+from scoring import EMOTION_WEIGHTS, score_timeline
+from timeline import EMOTION_TOKEN_BUDGET, EmotionTimeline
+from facs import TOP_FACS_K, FacsSeries, get_top_facs, load_series
 
 
 ########
 # SETUP
 ########
 
-app = Flask(__name__)
-
-
-def get_top_3_facs(predictions):
-    top_facs_per_clip = []  # List to hold results for all clips
-
-    for pred in predictions:  # Each file
-        for prediction in pred.results.predictions:  # Per file
-            facs_map = {}
-
-            for grouped_preds in prediction.models.face.grouped_predictions:
-                for pred in grouped_preds.predictions:  # Per frame per file
-                    facs = pred.facs
-
-                    for facs_score in facs:
-                        # Store the score along with the file name
-                        if facs_score.name not in facs_map:
-                            facs_map[facs_score.name] = (
-                                facs_score.score,
-                                prediction.file,
-                            )
-                        else:
-                            # Update the score, but keep the same file name
-                            existing_score, _ = facs_map[facs_score.name]
-                            facs_map[facs_score.name] = (
-                                existing_score + facs_score.score,
-                                prediction.file,
-                            )
-
-            # Average the scores by the number of frames (assuming 15 frames)
-            for key in facs_map.keys():
-                score, file = facs_map[key]
-                facs_map[key] = (score / 15.0, file)
-
-            # Get the top 3 FACS scores sorted by score
-            top_3_facs = sorted(facs_map.items(), key=lambda x: x[1][0], reverse=True)[
-                :3
-            ]
-
-            # Store the top FACS scores for this clip
-            top_facs_per_clip.extend(
-                (facs_name, score, file) for facs_name, (score, file) in top_3_facs
-            )
-
-    return top_facs_per_clip
+# Served by an ASGI server (e.g. hypercorn server:app), one event loop per worker
+app = Quart(__name__)
+# Stream uploads straight to a scratch file instead of buffering them in memory
+app.request_class = StreamingUploadRequest
+app.asgi_http_class = BackpressureHTTPConnection
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+# Seconds allowed to receive a request body and to produce a response; a long
+# recording's upload and analysis take far longer than Quart's 60 s defaults
+app.config["BODY_TIMEOUT"] = int(os.getenv("BODY_TIMEOUT", "600"))
+app.config["RESPONSE_TIMEOUT"] = int(os.getenv("RESPONSE_TIMEOUT", "900"))
+
+# Threads for blocking work (ffmpeg, Whisper, the Groq client, disk) so it
+# never stalls the event loop
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking"
+)
+
+# Load Whisper once at startup instead of on the first upload; with a worker
+# pool the workers hold the models and this process never loads one
+if inference.WHISPER_WORKERS <= 0:
+    model_registry.preload()
+
+# Background analyses for /api/postVoice?async=1, run on the serving loop
+job_manager = JobManager()
+ANALYSIS_STAGES = ("splitting", "transcribing", "face_analysis")
+
+# One polling loop for every outstanding Hume batch job (runs on the client loop)
+job_poller = HumeJobPoller()
+
+# Finished {transcription, behavior} results keyed by upload hash + pipeline config;
+# each result's FACS series is stored in the cache as an attachment of its entry
+result_cache = ResultCache()
+FACS_SERIES_SUFFIX = ".facs.npz"
+
+
+@app.before_serving
+async def start_clients():
+    # The pooled clients and the Hume poller live on this worker's loop
+    bind_client_loop(asyncio.get_running_loop())
+    # Start the Whisper workers (and load their models) before the first upload
+    await run_blocking(inference.get_pool)
+
+
+@app.after_serving
+async def stop_clients():
+    job_manager.shutdown()
+    await close_clients()
+    inference.shutdown_pool()
+
+
+async def run_blocking(fn, *args):
+    """Runs a blocking call on blocking_executor and awaits its result."""
+    return await asyncio.get_running_loop().run_in_executor(
+        blocking_executor, fn, *args
+    )
 
 
 async def process_videos_hume(client, files):
-    face_config = Face(facs={})
+    # Clips encoded for the face model already hold only the frames worth
+    # predicting on, so every one of them is analyzed
+    face_options = {"fps_pred": 0} if CLIP_ENCODING == "face" else {}
+    face_config = Face(facs={}, **face_options)
     models_chosen = Models(face=face_config)
-    stringified_configs = InferenceBaseRequest(models=models_chosen)
+    stringified_configs = InferenceBaseRequest(
+        models=models_chosen, callback_url=callback_url()
+    )
 
+    upload_bytes = sum(os.fstat(file.fileno()).st_size for file in files)
+    started = time.perf_counter()
     job_id = (
         await client.expression_measurement.batch.start_inference_job_from_local_file(
             json=stringified_configs, file=files
         )
     )
-    await poll_for_completion(client, job_id)
-    job_predictions = await client.expression_measurement.batch.get_job_predictions(
-        id=job_id
+    job_details = await poll_for_completion(client, job_id)
+    completed = job_details.state.status == "COMPLETED"
+    job_predictions = (
+        await client.expression_measurement.batch.get_job_predictions(id=job_id)
+        if completed
+        else []
     )
-    top_facs_scores = get_top_3_facs(job_predictions)
-    return top_facs_scores
-
-
-async def poll_for_completion(client: AsyncHumeClient, job_id, timeout=120):
+    print(
+        f"Hume job {job_id}: {len(files)} clips, {upload_bytes / 2**20:.2f} MiB "
+        f"uploaded ({CLIP_ENCODING} encoding), {time.perf_counter() - started:.1f}s turnaround"
+    )
+    return job_predictions, completed
+
+
+def pipeline_config():
+    """The settings that change /api/postVoice output, part of every cache key."""
+    return {
+        "clip_duration": CLIP_DURATION,
+        "segmentation": (
+            [CLIP_SEGMENTATION, CLIP_MIN_SECONDS, CLIP_MAX_SECONDS, MAX_CLIPS_PER_JOB]
+            if CLIP_SEGMENTATION == "pause"
+            else CLIP_SEGMENTATION
+        ),
+        "model": model_registry.DEFAULT_MODEL,
+        "transcribe_mode": TRANSCRIBE_MODE,
+        "clip_encoding": (
+            [CLIP_ENCODING, FACE_VIDEO_HEIGHT, FACE_VIDEO_FPS, FACE_VIDEO_KBPS]
+            if CLIP_ENCODING == "face"
+            else CLIP_ENCODING
+        ),
+        "vad": (
+            [VAD_THRESHOLD_DB, VAD_FLOOR_DB, VAD_SPEECH_DB, VAD_MIN_SPEECH_SECONDS]
+            if SKIP_SILENT_CLIPS
+            else None
+        ),
+    }
+
+
+async def analyze_recording(video_path, job=None, key=None):
     """
-    Polls for the completion of a job with a specified timeout (in seconds).
-
-    Uses asyncio.wait_for to enforce a maximum waiting time.
+    Runs the /api/postVoice pipeline on a recording on disk: clip splitting,
+    Whisper transcription and Hume face analysis. When run as a job, each
+    stage is reported on the job and cancellation is honoured between stages
+    and while waiting on Hume. With a cache key, a cached result is returned
+    without running anything and a fresh result is stored.
     """
+    if key is not None:
+        cached = await run_blocking(result_cache.get, key)
+        if cached is not None:
+            return cached
+
+    all_transcriptions, video_files, audio_files = await run_blocking(
+        lambda: extract_video_audio(video_path, progress=job.start_stage if job else None)
+    )
+    print(all_transcriptions, video_files)
+
     try:
-        # Wait for the job to complete or until the timeout is reached
-        await asyncio.wait_for(poll_until_complete(client, job_id), timeout=timeout)
-    except asyncio.TimeoutError:
-        # Notify if the polling operation has timed out
-        print(f"Polling timed out after {timeout} seconds.")
+        if job:
+            job.start_stage("face_analysis")
+        if not video_files:
+            # Every clip was silent (or the recording empty): nothing for Hume
+            return await run_blocking(
+                summarize_analysis, all_transcriptions, video_files, [], key
+            )
+        local_files = [open(file, "rb") for file in video_files]
+        try:
+            # The pooled Hume client lives on the shared client loop
+            hume_analysis = on_client_loop(
+                process_videos_hume(get_hume_client(), local_files)
+            )
+            if job:
+                job_predictions, completed = await job.run_cancellable(hume_analysis)
+            else:
+                job_predictions, completed = await hume_analysis
+        finally:
+            for local_file in local_files:
+                local_file.close()
+    finally:
+        remove_clip_files(video_files, audio_files)
+
+    # A failed Hume job is reported without face data, but never cached
+    return await run_blocking(
+        summarize_analysis,
+        all_transcriptions,
+        video_files,
+        job_predictions,
+        key if completed else None,
+    )
 
 
-async def poll_until_complete(client: AsyncHumeClient, job_id):
+def summarize_analysis(all_transcriptions, video_files, job_predictions, key=None):
     """
-    Continuously polls the job status until it is completed, failed, or an unexpected status is encountered.
-
-    Implements exponential backoff to reduce the frequency of requests over time.
+    Aggregates the Hume predictions into the /api/postVoice result. With a
+    cache key, the result is also stored under it.
     """
-    last_status = None
-    delay = 1  # Start with a 1-second delay
-
-    while True:
-        # Wait for the specified delay before making the next status check
-        await asyncio.sleep(delay)
-
-        # Retrieve the current job details
-        job_details = await client.expression_measurement.batch.get_job_details(job_id)
-        status = job_details.state.status
-
-        # If the status has changed since the last check, print the new status
-        if status != last_status:
-            print(f"Status changed: {status}")
-            last_status = status
-
-        if status == "COMPLETED":
-            # Job has completed successfully
-            print("\nJob completed successfully:")
-            # Convert timestamps from milliseconds to datetime objects
-            created_time = datetime.fromtimestamp(
-                job_details.state.created_timestamp_ms / 1000
-            )
-            started_time = datetime.fromtimestamp(
-                job_details.state.started_timestamp_ms / 1000
-            )
-            ended_time = datetime.fromtimestamp(
-                job_details.state.ended_timestamp_ms / 1000
-            )
-            # Print job details neatly
-            print(f"  Created at: {created_time}")
-            print(f"  Started at: {started_time}")
-            print(f"  Ended at:   {ended_time}")
-            print(f"  Number of errors: {job_details.state.num_errors}")
-            print(f"  Number of predictions: {job_details.state.num_predictions}")
-            break
-        elif status == "FAILED":
-            # Job has failed
-            print("\nJob failed:")
-            # Convert timestamps from milliseconds to datetime objects
-            created_time = datetime.fromtimestamp(
-                job_details.state.created_timestamp_ms / 1000
-            )
-            started_time = datetime.fromtimestamp(
-                job_details.state.started_timestamp_ms / 1000
-            )
-            ended_time = datetime.fromtimestamp(
-                job_details.state.ended_timestamp_ms / 1000
-            )
-            # Print error details neatly
-            print(f"  Created at: {created_time}")
-            print(f"  Started at: {started_time}")
-            print(f"  Ended at:   {ended_time}")
-            print(f"  Error message: {job_details.state.message}")
-            break
+    top_facs_scores = get_top_facs(job_predictions)
+
+    # Keep every frame's FACS scores so the report can query any time range
+    # later without another Hume job. The series is written into the cache
+    # before the result, so it counts toward the cache size and is evicted
+    # with it; uncached results don't get one
+    series_id = None
+    if key is not None:
+        clip_offsets = clip_start_times(video_files, all_transcriptions)
+        FacsSeries.from_predictions(job_predictions, clip_offsets).save(
+            result_cache.attachment_path(key, FACS_SERIES_SUFFIX)
+        )
+        series_id = key
+
+    result = {
+        "transcription": all_transcriptions,
+        "behavior": top_facs_scores,
+        "facs_series": series_id,
+    }
+    if key is not None:
+        # Round-trip through JSON so hits and misses return identical shapes
+        result = json.loads(json.dumps(result))
+        result_cache.put(key, result)
+    return result
 
-        # Increase the delay exponentially, maxing out at 16 seconds
-        delay = min(delay * 2, 16)
+
+async def run_analysis_job(job, video_path, key=None):
+    # Jobs are tasks on the serving loop, next to the requests and clients
+    return await analyze_recording(video_path, job, key)
+
+
+async def poll_for_completion(client: AsyncHumeClient, job_id, timeout=120):
+    """
+    Waits for the shared job poller to see the job finish, with a specified
+    timeout (in seconds), and returns its details. Raises HumeJobTimeout if
+    the job is still running when the timeout expires.
+    """
+    try:
+        job_details = await job_poller.wait(
+            client, job_id, timeout=timeout, expect_callback=callback_url() is not None
+        )
+    except asyncio.TimeoutError:
+        raise HumeJobTimeout(f"Hume job {job_id} timed out after {timeout} seconds")
+    print_job_details(job_details)
+    return job_details
+
+
+def print_job_details(job_details):
+    """Prints the outcome of a finished Hume batch job."""
+    status = job_details.state.status
+    if status == "COMPLETED":
+        print("\nJob completed successfully:")
+    else:
+        print("\nJob failed:")
+
+    # Convert timestamps from milliseconds to datetime objects
+    created_time = datetime.fromtimestamp(job_details.state.created_timestamp_ms / 1000)
+    started_time = datetime.fromtimestamp(job_details.state.started_timestamp_ms / 1000)
+    ended_time = datetime.fromtimestamp(job_details.state.ended_timestamp_ms / 1000)
+    print(f"  Created at: {created_time}")
+    print(f"  Started at: {started_time}")
+    print(f"  Ended at:   {ended_time}")
+    if status == "COMPLETED":
+        print(f"  Number of errors: {job_details.state.num_errors}")
+        print(f"  Number of predictions: {job_details.state.num_predictions}")
+    else:
+        print(f"  Error message: {job_details.state.message}")
 
 
 def add_cors_headers(response):
     response.headers.add("Access-Control-Allow-Origin", "*")
-    response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
+    response.headers.add("Access-Control-Allow-Methods", "GET, POST, DELETE, OPTIONS")
     response.headers.add("Access-Control-Allow-Headers", "Content-Type")
     return response
 
 
 @app.after_request
-def after_request(response):
+async def after_request(response):
     return add_cors_headers(response)
 
 
+@app.teardown_request
+async def teardown_request(exception=None):
+    # Uploads that failed part way still leave a scratch file behind
+    remove_scratch_files(request)
+
+
+@app.errorhandler(413)
+async def upload_too_large(error):
+    return jsonify(
+        {"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}
+    ), 413
+
+
+@app.route("/api/models", methods=["GET"])
+async def get_model_stats() -> tuple:
+    stats = model_registry.model_stats()
+    stats["pool"] = inference.pool_stats()
+    return jsonify(stats), 200
+
+
 # ########
 # # EVI API
 # ########
@@ -215,264 +381,317 @@ async def upload_video() -> tuple:
     if request.method == "OPTIONS":
         return jsonify({}), 200  # Respond to preflight request
 
-    if "file" not in request.files:
+    files = await request.files
+    if "file" not in files:
         return jsonify({"error": "No file part in the request"}), 400
 
-    file = request.files["file"]
+    file = files["file"]
     if not file.filename:
         return jsonify({"error": "No file selected for uploading"}), 400
 
+    key = cache_key(upload_digest(file), pipeline_config())
+    form = await request.form
+    if request.args.get("async") == "1" or form.get("async") == "1":
+        return submit_analysis_job(file, key)
+
     try:
-        video_buffer = io.BytesIO()
-        file.save(video_buffer)
-        video_buffer.seek(0)
-
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", delete=False
-        ) as temp_video_file:
-            temp_video_file.write(video_buffer.read())
-            temp_video_file.flush()
-            all_transcriptions, video_files, audio_files = extract_video_audio(
-                temp_video_file.name
-            )
-            print(all_transcriptions, video_files)
+        video_path = scratch_path(file)
+        result = await analyze_recording(video_path, key=key)
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error during transcription: {e}")
+        return jsonify({"error": str(e)}), 500
 
-            client = AsyncHumeClient(api_key=API_KEY)
 
-            local_filepaths = [open(file, "rb") for file in video_files]
-            face_config = Face(facs={})
-            models_chosen = Models(face=face_config)
-            stringified_configs = InferenceBaseRequest(models=models_chosen)
-            job_id = await client.expression_measurement.batch.start_inference_job_from_local_file(
-                json=stringified_configs, file=local_filepaths
-            )
-            await poll_for_completion(client, job_id, timeout=120)
-            job_predictions = (
-                await client.expression_measurement.batch.get_job_predictions(id=job_id)
-            )
-            top_facs_scores = get_top_3_facs(job_predictions)
+def submit_analysis_job(file, key=None) -> tuple:
+    """Queues the upload as a job and answers right away with the job id."""
+    video_path = detach_upload(file)
+    try:
+        job = job_manager.submit(
+            run_analysis_job,
+            video_path,
+            key,
+            stages=ANALYSIS_STAGES,
+            on_finish=lambda job: os.remove(video_path),
+        )
+    except QueueFull as e:
+        os.remove(video_path)
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify(
+        {
+            "job_id": job.id,
+            "status_url": f"/api/jobs/{job.id}",
+            "result_url": f"/api/jobs/{job.id}/result",
+        }
+    ), 202
 
-        for file in video_files + audio_files:
-            os.remove(file)
 
-        os.remove(temp_video_file.name)
+@app.route("/api/hume/callback", methods=["POST"])
+async def hume_callback() -> tuple:
+    """
+    Receives Hume's completion callback for a batch job. The payload is only
+    used to learn the job id; the poller then fetches the job details from
+    Hume itself, so a forged callback can't inject results.
+    """
+    if HUME_CALLBACK_TOKEN and request.args.get("token") != HUME_CALLBACK_TOKEN:
+        return jsonify({"error": "Invalid callback token"}), 403
 
-        return jsonify(
-            {"transcription": all_transcriptions, "behavior": top_facs_scores}
-        ), 200
+    data = await request.get_json(silent=True) or {}
+    job_id = data.get("job_id")
+    if not job_id:
+        return jsonify({"error": "No job_id in callback"}), 400
+
+    # Thread-safe in case the client loop isn't this request's loop
+    client_loop().call_soon_threadsafe(job_poller.expedite, job_id)
+    return jsonify({"received": job_id}), 200
+
+
+@app.route("/api/facs/<series_id>", methods=["GET"])
+async def query_facs_series(series_id) -> tuple:
+    """
+    Queries a recording's stored FACS series. Optional query parameters:
+    start and end (seconds), k (top units) and rolling (window in seconds,
+    adds per-frame rolling means of the top units).
+    """
+    series = await run_blocking(
+        load_series, result_cache.attachment_path(series_id, FACS_SERIES_SUFFIX)
+    )
+    if series is None:
+        return jsonify({"error": "Unknown FACS series"}), 404
+
+    try:
+        start = request.args.get("start", type=float)
+        end = request.args.get("end", type=float)
+        k = request.args.get("k", default=TOP_FACS_K, type=int)
+        rolling = request.args.get("rolling", type=float)
+
+        top = series.top_k(start, end, k)
+        _, timestamps = series.window(start, end)
+        response = {
+            "start": start,
+            "end": end,
+            "frames": len(timestamps),
+            "top_facs": top,
+        }
+        if rolling:
+            units = [name for name, _ in top]
+            timestamps, means = series.rolling_mean(rolling, units, start, end)
+            response["rolling_mean"] = {
+                "timestamps": timestamps.round(3).tolist(),
+                "units": units,
+                "means": means.round(4).tolist(),
+            }
+        return jsonify(response), 200
     except Exception as e:
-        print(f"Error during transcription: {e}")
+        print(f"Error querying FACS series: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/postFeedback", methods=["POST", "OPTIONS"])
-def get_feedback() -> tuple:
+@app.route("/api/poller/stats", methods=["GET"])
+async def get_poller_stats() -> tuple:
+    return jsonify(job_poller.stats()), 200
+
+
+@app.route("/api/cache/stats", methods=["GET"])
+async def get_cache_stats() -> tuple:
+    return jsonify(result_cache.stats()), 200
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET", "DELETE", "OPTIONS"])
+async def job_status(job_id) -> tuple:
     if request.method == "OPTIONS":
         return jsonify({}), 200  # Respond to preflight request
 
-    try:
-        data = request.get_json()
-        transcript = data.get("transcript", "no response")
-        questions = data.get("questions", None)
-        length_of_transcript = data.get("length", len(questions))
-        behaviors = data.get("behaviors", None)
-        emotions = data.get("emotions", None)
+    if request.method == "DELETE":
+        job = job_manager.cancel(job_id)
+    else:
+        job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict()), 200
+
 
-        # Now transcript_dict should be correctly processed
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+async def job_result(job_id) -> tuple:
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status == "completed":
+        return jsonify(job.result), 200
+    if job.finished:
+        return jsonify(job.to_dict()), 500 if job.status == "failed" else 410
+    return jsonify(job.to_dict()), 202
 
-        client = Groq(
-            api_key=GROQ_KEY,
+
+def prepare_feedback(data, mode):
+    """
+    Scores a /api/postFeedback payload and builds each question's prompt
+    context. Returns (questions, contexts, score, token_report).
+    """
+    transcript = data.get("transcript", "no response")
+    questions = data.get("questions", None)
+    length_of_transcript = data.get("length", len(questions))
+    behaviors = data.get("behaviors", None)
+    emotions = data.get("emotions", None)
+
+    # Now transcript_dict should be correctly processed
+
+    facial_expressions = behaviors  # For this example, assuming behaviors and facial_expressions are similar
+    # Scoring sees every reading; prompts get the timeline compacted to fit
+    # the emotion token budget
+    timeline = EmotionTimeline.from_readings(emotions)
+    final_interview_score = score_timeline(timeline, facial_expressions)
+    raw_emotions = emotions
+    if isinstance(emotions, list):
+        emotions = timeline.compact(weights=EMOTION_WEIGHTS)
+    print("Final Interview Score (Out of 100):", final_interview_score)
+    print("Transcript is: ", transcript)
+    length = min(len(questions), length_of_transcript)
+    print("transcript", length_of_transcript, "question: ", len(questions))
+
+    print(questions)
+    questions = questions[:length]
+    series_id = data.get("facs_series")
+    series = load_series(result_cache.attachment_path(series_id, FACS_SERIES_SUFFIX))
+
+    def compact_emotions(readings, windows):
+        # Each question's window is compacted on its own; a batched prompt
+        # holds every window, so they split one prompt's budget between them
+        budget = EMOTION_TOKEN_BUDGET // windows if mode == "batched" else EMOTION_TOKEN_BUDGET
+        return EmotionTimeline.from_readings(readings).compact(
+            weights=EMOTION_WEIGHTS, token_budget=budget
         )
 
-        facial_expression_weights = {
-            "AU43 EYE CLOSURE": -1,
-            "HAND OVER FOREHEAD": -1,
-            "AU54 HEAD DOWN": -1,
-            "HAND OVER MOUTH": -1,
-            "AU7 LIDS TIGHT": -1,
-            "AU12 LIP CORNER PULLER": 1,
-            "AU17 CHIN RAISER": 0,
-            "AU9 NOSE WRINKLE": -1,
-            "CRY": -2,
-            "SMILE": 1,
-            "LAUGH": 2,
-            "AU6 CHEEK RAISE": 1,
-            "AU53 HEAD UP": 0,
-            "AU19 TONGUE SHOW": 0,
-            "LICKING LIP": 0,
-            "AU37 LIP WIPE": 0,
-            "TENSE BROW LOWERER": -1,
-            "AU32 BITE": 0,
-            "AU10 UPPER LIP RAISER": 0,
-            "AU1 INNER BROW RAISE": -1,
-            "WIDE-EYED": 1,
-            "AU5 UPPER LID RAISE": 0,
-            "JAW DROP": -1,
-            "GASP": -1,
-            "AU27 MOUTH STRETCH": 0,  # Add more expressions as needed from the image
-        }
-        emotion_weights = {
-            "Admiration": 1,
-            "Adoration": 0,
-            "Aesthetic appreciation": 0,
-            "Amusement": 0,
-            "Anger": -2,
-            "Anxiety": -2,
-            "Awe": 0,
-            "Awkwardness": -1,
-            "Boredom": -1,
-            "Calmness": 1,
-            "Concentration": 1,
-            "Confusion": -1,
-            "Contemplation": 1,
-            "Contempt": -2,
-            "Contentment": 0,
-            "Craving": 0,
-            "Determination": 1,
-            "Desire": 0,
-            "Disappointment": -2,
-            "Disapproval": -1,
-            "Disgust": -2,
-            "Distress": -2,
-            "Doubt": -1,
-            "Ecstasy": 0,
-            "Embarrassment": -1,
-            "Empathetic pain": -1,
-            "Enthusiasm": 1,
-            "Entrancement": 0,
-            "Envy": -1,
-            "Excitement": 0,
-            "Fear": -2,
-            "Gratitude": 1,
-            "Guilt": -2,
-            "Horror": -2,
-            "Interest": 0,
-            "Joy": 0,
-            "Love": 0,
-            "Nostalgia": 0,
-            "Pain": -2,
-            "Pride": 1,
-            "Realization": 0,
-            "Relief": 0,
-            "Romance": 0,
-            "Sadness": -2,
-            "Sarcasm": -1,
-            "Satisfaction": 0,
-            "Shame": -2,
-            "Surprise(negative)": -1,
-            "Surprise(positive)": 0,
-            "Sympathy": 0,
-            "Tiredness": -1,
-            "Triumph": 0,
-        }
+    contexts = question_contexts(
+        questions,
+        transcript,
+        behaviors,
+        raw_emotions,
+        data.get("question_times"),
+        series,
+        compact_emotions,
+    )
+    full_context = [
+        {"transcript": transcript, "behaviors": behaviors, "emotions": emotions}
+    ] * len(questions)
+    raw_context = [
+        {"transcript": transcript, "behaviors": behaviors, "emotions": raw_emotions}
+    ] * len(questions)
+    token_report = {
+        "raw": prompt_tokens(questions, raw_context, mode),
+        "full": prompt_tokens(questions, full_context, mode),
+        "sliced": prompt_tokens(questions, contexts, mode),
+    }
+    print(
+        f"Feedback prompt tokens: {token_report['raw']} with the raw emotion "
+        f"timeline, {token_report['full']} compacted, "
+        f"{token_report['sliced']} with per-question windows"
+    )
+    return questions, contexts, final_interview_score, token_report
 
-        def calculate_emotional_score(emotions, emotion_weights):
-            total_score = 0
-            for interval in emotions:
-                for time, emotion_data in interval.items():
-                    if isinstance(emotion_data, dict):
-                        for emotion, prominence in emotion_data.items():
-                            weight = emotion_weights.get(
-                                emotion, 0
-                            )  # Get the weight, default to 0 if emotion not found
-                            total_score += weight * prominence
-            return total_score
-
-        def calculate_updated_facial_expression_score(
-            facial_expressions, facial_expression_weights
-        ):
-            expression_score = 0
-            for interval in facial_expressions:
-                if isinstance(interval, dict):
-                    for expression, prominence in interval.items():
-                        weight = facial_expression_weights.get(
-                            expression.upper(), 0
-                        )  # Default to 0 if not in the weights dictionary
-                        expression_score += weight * prominence
-            return expression_score
-
-        # Calculate the final score for the interview (includes LLM integration)
-        def calculate_interview_score_with_llm(
-            emotions,
-            facial_expressions,
-            emotion_weights,
-            transcript,
-            questions,
-            behaviors,
-        ):
-            emotional_score = calculate_emotional_score(emotions, emotion_weights)
-            facial_expression_score = calculate_updated_facial_expression_score(
-                facial_expressions, facial_expression_weights
-            )
-            # Normalize and combine scores (weights can be adjusted based on the importance of each factor)
-            total_emotional_score = max(
-                0, min(emotional_score, 50)
-            )  # Cap at 40 for normalization
-            total_facial_score = max(
-                0, min(facial_expression_score, 50)
-            )  # Cap at 20 for normalization
-            # Final score calculation with LLM quality score
-            final_score = total_emotional_score + total_facial_score
-            return final_score
-
-        facial_expressions = behaviors  # For this example, assuming behaviors and facial_expressions are similar
-        # Calculate the final interview score using LLM integration
-        final_interview_score = calculate_interview_score_with_llm(
-            emotions,
-            facial_expressions,
-            emotion_weights,
-            transcript,
-            questions,
-            behaviors,
+
+@app.route("/api/postFeedback", methods=["POST", "OPTIONS"])
+async def get_feedback() -> tuple:
+    if request.method == "OPTIONS":
+        return jsonify({}), 200  # Respond to preflight request
+
+    try:
+        data = await request.get_json()
+        mode = request.args.get("mode") or data.get("mode") or FEEDBACK_MODE
+        if mode not in FEEDBACK_MODES:
+            return jsonify({"error": f"Unknown feedback mode: {mode}"}), 400
+
+        client = get_groq_client()
+        questions, contexts, final_interview_score, token_report = await run_blocking(
+            prepare_feedback, data, mode
         )
-        print("Final Interview Score (Out of 100):", final_interview_score)
-        print("Transcript is: ", transcript)
-        length = min(len(questions), length_of_transcript)
-        print("transcript", length_of_transcript, "question: ", len(questions))
-
-        answers = []
-        print(questions)
-        for i in range(length):
-            chat_completion = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-                                The response should be strictly less than 70 words. You are an interview coach.
-                                Your task is to evaluate the performance and give specific feedback on how the user
-                                performs on a specific question. Make your performance assessment based on a variety of data
-                                sources including facial expressions, quality and depth of answers, and emotions.
-                                Outline both strengths and weaknesses of the user including ways to improve. Be extremely thorough and specific in your feedback.
-                                Here is an example output that the response MUST adhere to: 
-                                Question: question verbatim. 
-                                User's Response to Question: over here describe how well or not the user 
-                                answered the question.
-                                Emotion: Over here describe the top 3 emotions expressed by the user.
-                                Behavior: Over here describe the top 3 facial expressions shown by the user.
-                                Score: Finally here output a score out of 100 combining all 3 metrics above.
-                                """,
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""
-                Questions: {questions[i]},
-                Transcript: {transcript},
-                Behaviors: {behaviors},
-                Emotions: {emotions} 
-                """,
-                    },
-                ],
-                model="llama-3.1-8b-instant",
-            )
-            answers.append(chat_completion.choices[0].message.content)
+
+        feedback_fn = (
+            generate_feedback_batched if mode == "batched" else generate_feedback
+        )
+        answers, errors = await run_blocking(feedback_fn, client, questions, contexts)
 
         print(answers)
 
-        return jsonify({"feedback": answers, "score": final_interview_score}), 200
+        return jsonify(
+            {
+                "feedback": answers,
+                "errors": errors,
+                "score": final_interview_score,
+                "prompt_tokens": token_report,
+            }
+        ), 200
+    except Exception as e:
+        print(f"Error getting feedback: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/postFeedback/stream", methods=["POST", "OPTIONS"])
+async def stream_feedback_events():
+    """
+    Like /api/postFeedback, but answers with a text/event-stream that sends
+    each question's feedback as soon as it is ready instead of one JSON
+    body at the end. Events (all JSON data):
+      token     {index, delta}                  a piece of a question's feedback
+      feedback  {index, feedback, error, running_score}
+      done      {score, prompt_tokens, time_to_first_feedback, total_seconds}
+    Questions are always answered one completion each here, since a single
+    batched JSON reply can't be shown before it is complete.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200  # Respond to preflight request
+
+    try:
+        data = await request.get_json()
+        client = get_groq_client()
+        questions, contexts, final_interview_score, token_report = await run_blocking(
+            prepare_feedback, data, "per_question"
+        )
     except Exception as e:
         print(f"Error getting feedback: {e}")
         return jsonify({"error": str(e)}), 500
 
+    async def events():
+        started = time.perf_counter()
+        first_feedback = None
+        scores = []
+        # stream_feedback blocks between events, so it is iterated off the loop
+        async for event in run_sync_iterable(stream_feedback(client, questions, contexts)):
+            if event["type"] == "feedback":
+                if first_feedback is None:
+                    first_feedback = time.perf_counter() - started
+                score = feedback_score(event["feedback"])
+                if score is not None:
+                    scores.append(score)
+                event["running_score"] = sum(scores) / len(scores) if scores else None
+            yield sse_event(event.pop("type"), event)
+
+        total = time.perf_counter() - started
+        print(
+            f"Streamed feedback for {len(questions)} questions: first after "
+            f"{first_feedback if first_feedback is not None else 0:.2f}s, all after {total:.2f}s"
+        )
+        yield sse_event(
+            "done",
+            {
+                "score": final_interview_score,
+                "prompt_tokens": token_report,
+                "time_to_first_feedback": first_feedback,
+                "total_seconds": total,
+            },
+        )
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def sse_event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
 
 if __name__ == "__main__":
     app.run(port=8080, debug=True)
@@ -0,0 +1,156 @@
+import math
+import os
+
+import numpy as np
+
+from feedback import CHARS_PER_TOKEN
+
+# Seconds of EVI readings averaged into one timeline point
+EMOTION_WINDOW_SECONDS = float(os.getenv("EMOTION_WINDOW_SECONDS", "5"))
+# Emotions kept per timeline point in prompts
+EMOTION_TOP_K = int(os.getenv("EMOTION_TOP_K", "3"))
+# Decimal places emotion scores are rounded to in prompts
+EMOTION_DECIMALS = int(os.getenv("EMOTION_DECIMALS", "2"))
+# Estimated tokens the emotion timeline may take up in one prompt
+EMOTION_TOKEN_BUDGET = int(os.getenv("EMOTION_TOKEN_BUDGET", "600"))
+
+
+class EmotionTimeline:
+    """
+    The EVI emotion readings of an interview, summed into fixed time windows.
+
+    sums is a windows x emotions float64 matrix of the readings' scores in
+    each window, counts the number of readings per window, starts each
+    window's start time in seconds and names the column labels. Scoring
+    uses the sums, so it sees every reading; prompts use compact(), which
+    shrinks the timeline to fit a token budget.
+    """
+
+    def __init__(self, starts, sums, counts, names):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.names = list(names)
+
+    @classmethod
+    def from_readings(cls, emotions, window_seconds=EMOTION_WINDOW_SECONDS):
+        """
+        Builds the timeline from the [{"timestamp", "emotions"}] readings the
+        frontend posts. Like scoring, every dict value of a reading counts.
+        Readings without a usable timestamp join the previous reading's window.
+        """
+        name_index = {}
+        rows, columns, values = [], [], []
+        reading_windows = []
+        window = 0
+        for reading in emotions if isinstance(emotions, list) else []:
+            if not isinstance(reading, dict):
+                continue
+            try:
+                window = int(float(reading["timestamp"]) // window_seconds)
+            except (KeyError, TypeError, ValueError):
+                pass
+            reading_windows.append(window)
+            for emotion_data in reading.values():
+                if isinstance(emotion_data, dict):
+                    for name, score in emotion_data.items():
+                        column = name_index.setdefault(name, len(name_index))
+                        rows.append(window)
+                        columns.append(column)
+                        values.append(score)
+
+        if not reading_windows:
+            return cls(np.zeros(0), np.zeros((0, 0)), np.zeros(0), [])
+        # Only windows that received a reading become timeline points
+        windows, reading_rows = np.unique(reading_windows, return_inverse=True)
+        counts = np.bincount(reading_rows, minlength=len(windows))
+        sums = np.zeros((len(windows), len(name_index)), dtype=np.float64)
+        if values:
+            rows = np.searchsorted(windows, rows)
+            np.add.at(sums, (rows, np.array(columns)), np.array(values, dtype=np.float64))
+        return cls(windows * window_seconds, sums, counts, list(name_index))
+
+    def __len__(self):
+        return self.starts.shape[0]
+
+    def means(self):
+        return self.sums / np.maximum(self.counts, 1)[:, None]
+
+    def emotion_totals(self):
+        """{emotion name: score summed over every reading} of the interview."""
+        return dict(zip(self.names, self.sums.sum(axis=0).tolist()))
+
+    def compact(
+        self,
+        top_k=EMOTION_TOP_K,
+        decimals=EMOTION_DECIMALS,
+        token_budget=EMOTION_TOKEN_BUDGET,
+        weights=None,
+    ):
+        """
+        Returns the timeline as [{"timestamp", "emotions"}] points, in the
+        shape the frontend posts, small enough for a prompt: each window's
+        mean scores reduced to its top_k emotions, rounded to decimals, and
+        the windows downsampled until the estimated tokens fit token_budget.
+        Downsampling keeps the points that best preserve the shape of the
+        interview's emotional arc: the weighted score per window when
+        weights ({name: weight}) are given, else the strongest emotion.
+        """
+        if len(self) == 0:
+            return []
+        means = self.means()
+        points = [self._point(i, means[i], top_k, decimals) for i in range(len(self))]
+
+        # Points of one interview are about the same size, so the average
+        # tells how many fit
+        tokens_per_point = len(repr(points)) / CHARS_PER_TOKEN / len(points)
+        keep = max(2, int(token_budget / tokens_per_point))
+        if keep >= len(points):
+            return points
+
+        if weights is not None:
+            weight_vector = np.array([weights.get(name, 0) for name in self.names])
+            series = means @ weight_vector
+        else:
+            series = means.max(axis=1)
+        return [points[i] for i in largest_triangle_buckets(self.starts, series, keep)]
+
+    def _point(self, window, scores, top_k, decimals):
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k] if k > 0 else []
+        top = sorted(top, key=lambda i: -scores[i])
+        return {
+            "timestamp": f"{self.starts[window]:.2f}",
+            "emotions": {
+                self.names[i]: round(float(scores[i]), decimals) for i in top if scores[i] > 0
+            },
+        }
+
+
+def largest_triangle_buckets(x, y, keep):
+    """
+    Indices of keep points of the (x, y) series chosen by
+    Largest-Triangle-Three-Buckets: the first and last points, plus from each
+    of keep - 2 equal buckets in between the point forming the largest
+    triangle with the previously chosen point and the next bucket's mean.
+    Peaks and dips survive where plain striding would skip them.
+    """
+    count = len(x)
+    if keep >= count or keep < 3:
+        return list(range(count)) if keep >= count else [0, count - 1]
+
+    chosen = [0]
+    bucket_size = (count - 2) / (keep - 2)
+    for bucket in range(keep - 2):
+        lo = int(math.floor(bucket * bucket_size)) + 1
+        hi = int(math.floor((bucket + 1) * bucket_size)) + 1
+        next_lo, next_hi = hi, min(int(math.floor((bucket + 2) * bucket_size)) + 1, count)
+        next_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        next_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        a = chosen[-1]
+        areas = np.abs(
+            (x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a])
+        )
+        chosen.append(lo + int(np.argmax(areas)))
+    chosen.append(count - 1)
+    return chosen
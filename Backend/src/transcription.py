@@ -1,11 +1,44 @@
 # transcriber.py
 from moviepy.editor import VideoFileClip
-import whisper
+import bisect
+import os
+import re
+import shutil
 import ssl
+import tempfile
+
+from audio import SAMPLE_RATE, decode_audio, pause_windows, silent_windows, slice_audio
+from clips import (
+    CLIP_ENCODING,
+    FACE_VIDEO_FPS,
+    FACE_VIDEO_HEIGHT,
+    FACE_VIDEO_KBPS,
+    split_in_parallel,
+    split_with_ffmpeg,
+)
+from inference import transcribe, transcribe_many
 
 # Set up unverified SSL context if needed
 ssl._create_default_https_context = ssl._create_unverified_context
 
+# Length of the clips sent to Hume and the transcription buckets, in seconds
+CLIP_DURATION = int(os.getenv("CLIP_DURATION", "5"))
+# "clip" runs Whisper on every clip, "full" runs it once over the whole recording
+TRANSCRIBE_MODE = os.getenv("TRANSCRIBE_MODE", "clip")
+# "ffmpeg" cuts every clip in one segment-muxer pass, "parallel" encodes clips
+# concurrently as separate ffmpeg children, "moviepy" re-encodes clip by clip
+CLIP_SPLITTER = os.getenv("CLIP_SPLITTER", "ffmpeg")
+# Leave clips without speech out of Whisper and the Hume upload
+SKIP_SILENT_CLIPS = os.getenv("SKIP_SILENT_CLIPS", "1") == "1"
+# "fixed" cuts a clip every CLIP_DURATION seconds, "pause" cuts in the pauses
+# between words, CLIP_MIN_SECONDS to CLIP_MAX_SECONDS apart
+CLIP_SEGMENTATION = os.getenv("CLIP_SEGMENTATION", "fixed")
+CLIP_MIN_SECONDS = float(os.getenv("CLIP_MIN_SECONDS", "3"))
+CLIP_MAX_SECONDS = float(os.getenv("CLIP_MAX_SECONDS", "8"))
+# Most clips one recording is cut into in "pause" mode; longer recordings
+# get proportionally longer clips
+MAX_CLIPS_PER_JOB = int(os.getenv("MAX_CLIPS_PER_JOB", "240"))
+
 
 def split_video_into_clips(video_file_path, clip_duration=5):
     """Splits the video into smaller clips of fixed duration."""
@@ -20,37 +53,244 @@ def split_video_into_clips(video_file_path, clip_duration=5):
     return clips
 
 
-def extract_video_audio(video_file_path, clip_duration=5):
-    clips = split_video_into_clips(video_file_path, clip_duration)
+def write_moviepy_clips(
+    video_file_path, output_dir, clip_duration=5, write_audio=False, windows=None
+):
+    """
+    Writes every clip with moviepy, re-encoding each one in Python. Clips are
+    clip_duration long unless windows gives their (start, end) times.
+    """
+    if windows is None:
+        clips = split_video_into_clips(video_file_path, clip_duration)
+        starts = [i * clip_duration for i in range(len(clips))]
+    else:
+        video = VideoFileClip(video_file_path)
+        clips = [(video.subclip(start, end), end) for start, end in windows]
+        starts = [start for start, _ in windows]
 
-    i = 0
     video_file_paths = []
     audio_file_paths = []
-    all_transcriptions = []
-    for clip, clip_end_time in clips:
-        audio_file_path = f"audio_{i}.wav"
-        vid_file_path = f"video_{i}.mp4"
+    clip_windows = []
+    for i, (clip, clip_end_time) in enumerate(clips):
+        audio_file_path = os.path.join(output_dir, f"audio_{i}.wav")
+        vid_file_path = os.path.join(output_dir, f"video_{i}.mp4")
         video_file_paths.append(vid_file_path)
-        audio_file_paths.append(audio_file_path)
+        clip_windows.append((starts[i], clip_end_time))
+
+        if write_audio:
+            audio_file_paths.append(audio_file_path)
+            clip.audio.write_audiofile(audio_file_path)
+        if CLIP_ENCODING == "face":
+            if clip.h > FACE_VIDEO_HEIGHT:
+                clip = clip.resize(height=FACE_VIDEO_HEIGHT)
+            clip.write_videofile(
+                vid_file_path,
+                fps=FACE_VIDEO_FPS,
+                bitrate=f"{FACE_VIDEO_KBPS}k",
+                audio=False,
+            )
+        else:
+            clip.write_videofile(vid_file_path)
+
+    return (clip_windows, video_file_paths, audio_file_paths)
+
 
-        clip.audio.write_audiofile(audio_file_path)
-        clip.write_videofile(vid_file_path)
+def extract_video_audio(
+    video_file_path,
+    clip_duration=CLIP_DURATION,
+    mode=None,
+    splitter=None,
+    write_audio=False,
+    progress=None,
+    skip_silent=None,
+    segmentation=None,
+):
+    """
+    Cuts the recording into clips for face analysis and transcribes it.
 
-        transcription = transcribe_video(vid_file_path, clip_end_time)
-        all_transcriptions.append(transcription)
+    The audio track is decoded once into memory and every clip is transcribed
+    from a slice of it; per-clip .wav files are only written if write_audio is set.
+    With skip_silent, clips the voice-activity detector finds no speech in
+    keep an empty transcription entry at their end time, are not transcribed
+    and are dropped from the returned video clips, so Hume never sees them.
+    segmentation "pause" (see CLIP_SEGMENTATION) cuts clips in speech pauses
+    rather than every clip_duration seconds; the returned transcription keys
+    are the clip end times either way.
+    progress, if given, is called with "splitting" and then "transcribing".
+    """
+    progress = progress or (lambda stage: None)
+    skip_silent = SKIP_SILENT_CLIPS if skip_silent is None else skip_silent
+    mode = mode or TRANSCRIBE_MODE
+    splitter = splitter or CLIP_SPLITTER
+    segmentation = segmentation or CLIP_SEGMENTATION
+    output_dir = tempfile.mkdtemp(prefix="clips_")
+    try:
+        progress("splitting")
+        audio = decode_audio(video_file_path)
+        windows = segment_windows(audio, clip_duration) if segmentation == "pause" else None
+        if splitter == "moviepy":
+            clip_windows, video_file_paths, audio_file_paths = write_moviepy_clips(
+                video_file_path, output_dir, clip_duration, write_audio, windows
+            )
+        elif splitter == "parallel":
+            clip_windows, video_file_paths, audio_file_paths = split_in_parallel(
+                video_file_path,
+                output_dir,
+                clip_duration,
+                write_audio=write_audio,
+                windows=windows,
+            )
+        else:
+            clip_windows, video_file_paths, audio_file_paths = split_with_ffmpeg(
+                video_file_path, output_dir, clip_duration, write_audio, windows
+            )
+        if not video_file_paths:
+            os.rmdir(output_dir)
 
-        i += 1
+        progress("transcribing")
+        silent = (
+            silent_windows(audio, clip_windows) if skip_silent else [False] * len(clip_windows)
+        )
+        if mode == "full":
+            # One pass covers the whole recording either way; silent clips are
+            # only blanked, so Whisper can't put hallucinated words in them
+            all_transcriptions = [
+                {end_time: ""} if is_silent else clip
+                for clip, is_silent, (_, end_time) in zip(
+                    transcribe_full_recording(audio, clip_windows), silent, clip_windows
+                )
+            ]
+        else:
+            voiced = [window for window, is_silent in zip(clip_windows, silent) if not is_silent]
+            texts = iter(transcribe_clips(audio, voiced))
+            all_transcriptions = [
+                {end_time: ""} if is_silent else next(texts)
+                for (_, end_time), is_silent in zip(clip_windows, silent)
+            ]
+
+        if any(silent):
+            report_silence(clip_windows, silent)
+            for path, is_silent in zip(video_file_paths, silent):
+                if is_silent:
+                    os.remove(path)
+            video_file_paths = [
+                path for path, is_silent in zip(video_file_paths, silent) if not is_silent
+            ]
+            if not video_file_paths and not audio_file_paths:
+                os.rmdir(output_dir)
+    except Exception:
+        # Nothing is returned, so nobody else will remove the clips
+        shutil.rmtree(output_dir, ignore_errors=True)
+        raise
 
     return (all_transcriptions, video_file_paths, audio_file_paths)
 
 
-def transcribe_video(audio_file_path, clip_end_time):
-    """Transcribes the given video file in clips using Whisper with aligned timestamps."""
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_file_path, task="transcribe", language="en")
-    transcription = {clip_end_time: result["text"]}
+def segment_windows(audio, clip_duration=CLIP_DURATION):
+    """
+    Pause-aligned clip windows for the decoded recording. Clip lengths are
+    scaled up as far as needed to stay within MAX_CLIPS_PER_JOB clips.
+    """
+    duration = audio.shape[0] / SAMPLE_RATE
+    scale = max(1.0, duration / (MAX_CLIPS_PER_JOB * clip_duration))
+    while True:
+        windows = pause_windows(
+            audio,
+            clip_duration * scale,
+            CLIP_MIN_SECONDS * scale,
+            CLIP_MAX_SECONDS * scale,
+        )
+        if len(windows) <= MAX_CLIPS_PER_JOB:
+            return windows
+        scale *= 1.25
+
+
+def report_silence(clip_windows, silent):
+    """Prints how much Whisper and Hume work the silent clips saved."""
+    total_seconds = sum(end - start for start, end in clip_windows)
+    silent_seconds = sum(
+        end - start for (start, end), is_silent in zip(clip_windows, silent) if is_silent
+    )
+    print(
+        f"Skipped {sum(silent)} of {len(clip_windows)} clips without speech "
+        f"({silent_seconds:.0f} of {total_seconds:.0f}s, "
+        f"{silent_seconds / max(total_seconds, 1e-9):.0%} of Whisper and Hume work)"
+    )
+
+
+def clip_start_times(video_file_paths, all_transcriptions):
+    """
+    Maps each clip file's name to its start time in the recording. Clips are
+    named after their window's index (video_<i>.mp4), which still holds when
+    silent clips were dropped from the list.
+    """
+    end_times = [end for clip in all_transcriptions for end in clip]
+    start_times = [0] + end_times[:-1]
+    offsets = {}
+    for position, path in enumerate(video_file_paths):
+        name = os.path.basename(path)
+        match = re.fullmatch(r"video_(\d+)\.mp4", name)
+        index = int(match.group(1)) if match else position
+        if index < len(start_times):
+            offsets[name] = start_times[index]
+    return offsets
+
+
+def remove_clip_files(video_file_paths, audio_file_paths):
+    """Deletes the clip files and the scratch directory they were written to."""
+    for file in video_file_paths + audio_file_paths:
+        os.remove(file)
+    for directory in {os.path.dirname(file) for file in video_file_paths + audio_file_paths}:
+        if directory and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def transcribe_clips(audio, clip_windows):
+    """
+    Transcribes every clip window of the decoded recording, spread across the
+    Whisper worker pool when there is one.
+    """
+    results = transcribe_many(
+        [slice_audio(audio, start_time, end_time) for start_time, end_time in clip_windows],
+        task="transcribe",
+        language="en",
+    )
+    return [
+        {end_time: result["text"]}
+        for (_, end_time), result in zip(clip_windows, results)
+    ]
+
+
+def transcribe_full_recording(audio, clip_windows):
+    """
+    Transcribes the whole recording in one Whisper pass and buckets the result
+    into the same [{clip_end_time: text}] shape the per-clip path returns.
+    """
+    result = transcribe(audio, task="transcribe", language="en", word_timestamps=True)
+    return bucket_segments(result["segments"], clip_windows)
+
+
+def bucket_segments(segments, clip_windows):
+    """
+    Assigns every Whisper word (or whole segment when word timestamps are
+    missing) to the clip window containing its midpoint.
+    """
+    if not clip_windows:
+        return []
+    texts = ["" for _ in clip_windows]
+    end_times = [end_time for _, end_time in clip_windows]
+
+    for segment in segments:
+        pieces = segment.get("words") or [segment]
+        for piece in pieces:
+            midpoint = (piece["start"] + piece["end"]) / 2
+            # Anything past the last window goes into the last clip
+            index = min(bisect.bisect_right(end_times, midpoint), len(end_times) - 1)
+            texts[index] += piece.get("word", piece.get("text", ""))
 
-    return transcription
+    return [
+        {end_time: text} for (_, end_time), text in zip(clip_windows, texts)
+    ]
 
 
 def process_transcription(transcription, clip_start_time, clip_end_time):
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+
+from quart import Request
+from quart.asgi import ASGIHTTPConnection
+from quart.wrappers.request import Body
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Where uploaded recordings are streamed to while a request is being handled
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or tempfile.gettempdir()
+# Requests with a larger body are rejected with 413 before the upload is read
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Received but unparsed body bytes after which the server stops reading more
+UPLOAD_BUFFER_BYTES = int(os.getenv("UPLOAD_BUFFER_BYTES", str(1024 * 1024)))
+
+
+class HashingFile:
+    """Wraps a scratch file and SHA-256 hashes every chunk as it is written."""
+
+    def __init__(self, file):
+        self._file = file
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def upload_stream_factory(
+    total_content_length, content_type, filename=None, content_length=None
+):
+    """Returns the scratch file a file part of a multipart upload is written to."""
+    suffix = os.path.splitext(filename or "")[1] or ".mp4"
+    return HashingFile(
+        tempfile.NamedTemporaryFile(
+            "wb+", dir=UPLOAD_DIR, prefix="upload_", suffix=suffix, delete=False
+        )
+    )
+
+
+class StreamingBody(Body):
+    """
+    Request body with backpressure.
+
+    Quart's Body buffers everything the server hands it, however far ahead
+    of the parser the client is. Here receiving pauses while
+    UPLOAD_BUFFER_BYTES are waiting to be consumed, so a body streamed into
+    a parser is only ever held a chunk at a time. A body that is awaited
+    whole (JSON) buffers as usual, since nothing would drain it before it is
+    complete.
+
+    Since the parser drains the buffer as it goes, max_content_length is
+    enforced against the running total received rather than what is
+    buffered, which also covers chunked bodies without a Content-Length.
+    """
+
+    def __init__(self, expected_content_length, max_content_length):
+        super().__init__(expected_content_length, max_content_length)
+        self._received = 0
+        self._buffer_whole = False
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    def __await__(self):
+        self._buffer_whole = True
+        self._drained.set()
+        return super().__await__()
+
+    async def __anext__(self):
+        try:
+            return await super().__anext__()
+        except StopAsyncIteration:
+            # Body only checks the limit before waiting, and going over it
+            # completes the body, which would otherwise read as a short one
+            if self._must_raise is not None:
+                raise self._must_raise
+            raise
+        finally:
+            self._drained.set()
+
+    def append(self, data):
+        if self._must_raise is not None:
+            return
+        self._received += len(data)
+        if self._max_content_length is not None and self._received > self._max_content_length:
+            self._must_raise = RequestEntityTooLarge()
+            self.set_complete()
+            self._drained.set()  # Keep receiving, so the rest is discarded
+            return
+        super().append(data)
+        if not self._buffer_whole and len(self._data) >= UPLOAD_BUFFER_BYTES:
+            self._drained.clear()
+
+    async def drained(self):
+        await self._drained.wait()
+
+
+class BackpressureHTTPConnection(ASGIHTTPConnection):
+    """Stops receiving a request body while its StreamingBody is full."""
+
+    async def handle_messages(self, request, receive):
+        while True:
+            if isinstance(request.body, StreamingBody):
+                await request.body.drained()
+            message = await receive()
+            if message["type"] == "http.request":
+                request.body.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    request.body.set_complete()
+            elif message["type"] == "http.disconnect":
+                return
+
+
+class StreamingUploadRequest(Request):
+    """
+    Request whose uploaded files are written straight to a scratch file.
+
+    Quart's multipart parser hands file parts to the stream returned by its
+    stream factory chunk by chunk as the body arrives, and with
+    BackpressureHTTPConnection the body never runs far ahead of the parser,
+    so memory use per upload stays flat no matter how long the recording is.
+    The scratch file is the only copy, and its content hash is computed on
+    the way in.
+    """
+
+    body_class = StreamingBody
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every scratch file opened, so one is still cleaned up when parsing
+        # fails part way (such as a 413) and request.files never gets set
+        self._scratch_files = []
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+
+        def stream_factory(*args, **kwargs):
+            stream = upload_stream_factory(*args, **kwargs)
+            self._scratch_files.append(stream)
+            return stream
+
+        parser.stream_factory = stream_factory
+        return parser
+
+
+def upload_digest(file) -> str:
+    """Returns the SHA-256 hex digest of an upload, hashing it now only if needed."""
+    if isinstance(file.stream, HashingFile):
+        return file.stream.sha256.hexdigest()
+
+    sha256 = hashlib.sha256()
+    with open(scratch_path(file), "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def scratch_path(file) -> str:
+    """
+    Returns the path of the on-disk copy of an uploaded file.
+
+    Uploads parsed by StreamingUploadRequest already live in a scratch file;
+    anything else is copied into one in UPLOAD_CHUNK_BYTES chunks.
+    """
+    stream = file.stream
+    name = getattr(stream, "name", None)
+    if _is_scratch_file(name):
+        stream.flush()
+        return name
+
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=UPLOAD_DIR, prefix="upload_", suffix=".mp4", delete=False
+    ) as scratch_file:
+        shutil.copyfileobj(stream, scratch_file, UPLOAD_CHUNK_BYTES)
+    return scratch_file.name
+
+
+def detach_upload(file) -> str:
+    """
+    Moves an upload's scratch file out of the request's cleanup and returns
+    its new path, for work that outlives the request. The caller deletes it.
+    """
+    path = scratch_path(file)
+    detached_path = os.path.join(
+        os.path.dirname(path), "detached_" + os.path.basename(path)
+    )
+    os.replace(path, detached_path)
+    return detached_path
+
+
+def remove_scratch_files(request):
+    """Deletes the scratch files behind a request's uploads, if any were parsed."""
+    # Not request.files: awaiting it would read the body if nothing was parsed
+    files = getattr(request, "_files", None) or {}
+    streams = [file.stream for file in files.values()]
+    streams += getattr(request, "_scratch_files", [])
+    for stream in streams:
+        name = getattr(stream, "name", None)
+        if _is_scratch_file(name):
+            stream.close()
+            if os.path.exists(name):
+                os.remove(name)
+
+
+def _is_scratch_file(name):
+    return (
+        isinstance(name, str)
+        and os.path.basename(name).startswith("upload_")
+        and os.path.dirname(os.path.abspath(name)) == os.path.abspath(UPLOAD_DIR)
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules import each other as top-level modules, as server.py runs from src/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,141 @@
+"""
+Connection reuse of the shared Hume and Groq clients, against a local
+HTTP/1.1 stand-in that plays both APIs and counts the TCP connections it
+accepts.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import clients
+
+CHAT_COMPLETION = {
+    "id": "chatcmpl-standin",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "llama-3.1-8b-instant",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": "Score: 80"},
+        }
+    ],
+}
+JOB_DETAILS = {
+    "type": "INFERENCE",
+    "job_id": "standin",
+    "user_id": "standin",
+    "request": {"files": [], "urls": [], "text": [], "notify": False},
+    "state": {
+        "status": "COMPLETED",
+        "created_timestamp_ms": 0,
+        "started_timestamp_ms": 0,
+        "ended_timestamp_ms": 0,
+        "num_predictions": 0,
+        "num_errors": 0,
+    },
+}
+REQUESTS = 20
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+    connections = set()
+    requests = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.connections.add(self.client_address)
+
+    def _reply(self, payload):
+        with self.lock:
+            type(self).requests += 1
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(CHAT_COMPLETION)
+
+    def do_GET(self):
+        self._reply(JOB_DETAILS)
+
+    def log_message(self, *args):
+        pass
+
+
+def reset():
+    with StandInHandler.lock:
+        StandInHandler.connections = set()
+        StandInHandler.requests = 0
+
+
+def start_stand_in():
+    """Serves StandInHandler on a free local port; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def base_url(monkeypatch):
+    server, base_url = start_stand_in()
+    monkeypatch.setattr(clients, "HUME_BASE_URL", base_url)
+    monkeypatch.setattr(clients, "GROQ_BASE_URL", base_url)
+    monkeypatch.setenv("API_KEY", "standin")
+    monkeypatch.setenv("GROQ_KEY", "standin")
+    reset()
+    yield base_url
+    clients.shutdown_clients()
+    server.shutdown()
+    server.server_close()
+
+
+def test_groq_client_reuses_one_connection(base_url):
+    for _ in range(REQUESTS):
+        clients.get_groq_client().chat.completions.create(
+            messages=[{"role": "user", "content": "hi"}], model="llama-3.1-8b-instant"
+        )
+
+    assert StandInHandler.requests == REQUESTS
+    assert len(StandInHandler.connections) == 1
+
+
+def test_hume_client_reuses_one_connection_across_loops(base_url):
+    async def shared_hume():
+        client = clients.get_hume_client()
+        for _ in range(REQUESTS):
+            await client.expression_measurement.batch.get_job_details("standin")
+
+    async def job_thread():
+        # Code on its own loop hops to the client loop
+        await clients.on_client_loop(shared_hume())
+
+    for _ in range(2):
+        asyncio.run(job_thread())
+
+    assert StandInHandler.requests == 2 * REQUESTS
+    assert len(StandInHandler.connections) == 1
+
+
+def test_stand_in_counts_a_connection_per_client(base_url):
+    from groq import Groq
+
+    for _ in range(3):
+        client = Groq(api_key="standin", base_url=base_url)
+        client.chat.completions.create(
+            messages=[{"role": "user", "content": "hi"}], model="llama-3.1-8b-instant"
+        )
+        client.close()
+
+    assert len(StandInHandler.connections) == 3
@@ -0,0 +1,157 @@
+"""
+JobManager runs jobs as tasks on the calling loop: at most `workers` at once,
+at most `max_queued` waiting or running, with cancellation and on_finish
+honoured whether a job was queued, running or done.
+"""
+import asyncio
+
+import pytest
+
+from jobs import JobManager, QueueFull
+
+
+async def wait_finished(*jobs):
+    while not all(job.finished for job in jobs):
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0)  # Let done callbacks run
+
+
+def test_jobs_run_at_most_workers_at_once():
+    async def main():
+        manager = JobManager(workers=2, max_queued=8)
+        running = 0
+        peak = 0
+
+        async def work(job, value):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return value * 2
+
+        jobs = [manager.submit(work, value) for value in range(5)]
+        assert all(job.status == "queued" for job in jobs)
+        await wait_finished(*jobs)
+        return peak, jobs
+
+    peak, jobs = asyncio.run(main())
+    assert peak == 2
+    assert [job.result for job in jobs] == [0, 2, 4, 6, 8]
+    assert all(job.status == "completed" for job in jobs)
+
+
+def test_submit_beyond_queue_depth_is_rejected():
+    async def main():
+        manager = JobManager(workers=1, max_queued=2)
+        release = asyncio.Event()
+
+        async def work(job):
+            await release.wait()
+
+        jobs = [manager.submit(work), manager.submit(work)]
+        with pytest.raises(QueueFull):
+            manager.submit(work)
+        release.set()
+        await wait_finished(*jobs)
+        # Finished jobs no longer count toward the depth
+        await wait_finished(manager.submit(work))
+
+    asyncio.run(main())
+
+
+def test_cancel_queued_job_finishes_it_and_runs_on_finish():
+    async def main():
+        manager = JobManager(workers=1, max_queued=4)
+        release = asyncio.Event()
+        finished = []
+        started = []
+
+        async def work(job, name):
+            started.append(name)
+            await release.wait()
+
+        first = manager.submit(work, "first", on_finish=finished.append)
+        second = manager.submit(work, "second", on_finish=finished.append)
+        await asyncio.sleep(0.01)
+
+        manager.cancel(second.id)
+        assert second.status == "cancelled"
+        release.set()
+        await wait_finished(first, second)
+        return first, second, finished, started
+
+    first, second, finished, started = asyncio.run(main())
+    assert first.status == "completed"
+    assert second.error == "Cancelled before it started"
+    assert started == ["first"]
+    assert set(finished) == {first, second}
+
+
+def test_cancel_running_job_stops_at_next_stage():
+    async def main():
+        manager = JobManager(workers=1, max_queued=4)
+        reached = asyncio.Event()
+        finished = []
+
+        async def work(job):
+            job.start_stage("one")
+            reached.set()
+            while True:
+                await asyncio.sleep(0.01)
+                job.start_stage("two")
+
+        job = manager.submit(work, stages=("one", "two"), on_finish=finished.append)
+        await reached.wait()
+        manager.cancel(job.id)
+        await wait_finished(job)
+        return job, finished
+
+    job, finished = asyncio.run(main())
+    assert job.status == "cancelled"
+    assert job.stages["one"] == "cancelled"
+    assert finished == [job]
+
+
+def test_failed_job_reports_its_error():
+    async def main():
+        manager = JobManager(workers=1, max_queued=4)
+
+        async def work(job):
+            raise ValueError("boom")
+
+        job = manager.submit(work)
+        await wait_finished(job)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "failed"
+    assert job.error == "boom"
+    assert job.to_dict()["finished_at"] is not None
+
+
+def test_run_cancellable_cancels_the_awaited_work():
+    async def main():
+        manager = JobManager(workers=1, max_queued=4)
+        inner_cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                inner_cancelled.set()
+                raise
+
+        async def work(job):
+            await job.run_cancellable(slow(), check_interval=0.01)
+
+        job = manager.submit(work)
+        await asyncio.sleep(0.02)
+        manager.cancel(job.id)
+        await wait_finished(job)
+        return job, inner_cancelled.is_set()
+
+    job, inner_cancelled = asyncio.run(main())
+    assert job.status == "cancelled"
+    assert inner_cancelled
+
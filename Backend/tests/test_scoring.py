@@ -0,0 +1,133 @@
+"""
+Golden checks of interview scoring against the per-request closures
+get_feedback used before scoring.py, on synthetic interviews that include the
+edge cases of the payloads the frontend sends: a behaviors dict instead of a
+list, mixed-case and unknown names, non-dict reading values and empty
+interviews.
+"""
+import random
+
+import pytest
+
+from scoring import (
+    EMOTION_WEIGHTS,
+    FACIAL_EXPRESSION_WEIGHTS,
+    ScoringEngine,
+    score_interview,
+    score_interviews,
+    score_timeline,
+)
+from timeline import EmotionTimeline
+
+
+def legacy_interview_score(emotions, facial_expressions):
+    """What get_feedback computed before scoring.py."""
+
+    def calculate_emotional_score(emotions, emotion_weights):
+        total_score = 0
+        for interval in emotions:
+            for time, emotion_data in interval.items():
+                if isinstance(emotion_data, dict):
+                    for emotion, prominence in emotion_data.items():
+                        weight = emotion_weights.get(emotion, 0)
+                        total_score += weight * prominence
+        return total_score
+
+    def calculate_updated_facial_expression_score(
+        facial_expressions, facial_expression_weights
+    ):
+        expression_score = 0
+        for interval in facial_expressions:
+            if isinstance(interval, dict):
+                for expression, prominence in interval.items():
+                    weight = facial_expression_weights.get(expression.upper(), 0)
+                    expression_score += weight * prominence
+        return expression_score
+
+    emotional_score = calculate_emotional_score(emotions, dict(EMOTION_WEIGHTS))
+    facial_expression_score = calculate_updated_facial_expression_score(
+        facial_expressions, dict(FACIAL_EXPRESSION_WEIGHTS)
+    )
+    total_emotional_score = max(0, min(emotional_score, 50))
+    total_facial_score = max(0, min(facial_expression_score, 50))
+    return total_emotional_score + total_facial_score
+
+
+def synthetic_interview(rng, readings):
+    emotion_names = list(EMOTION_WEIGHTS) + ["Not an emotion"]
+    expression_names = list(FACIAL_EXPRESSION_WEIGHTS) + ["NOT A UNIT"]
+    # EVI reports a score for every emotion in each reading; a few readings
+    # are partial or carry unknown names
+    emotions = [
+        {
+            "timestamp": f"{i * 1.5:.2f}",
+            "emotions": {
+                name: rng.random() * rng.choice((0.02, 0.1, 0.5))
+                for name in (
+                    emotion_names
+                    if rng.random() > 0.02
+                    else rng.sample(emotion_names, rng.randint(0, 12))
+                )
+            },
+        }
+        for i in range(rng.randint(0, readings))
+    ]
+    spell = lambda name: rng.choice((name, name.lower(), name.title()))  # noqa: E731
+    expressions = [
+        {spell(name): rng.random() for name in rng.sample(expression_names, 5)}
+        if rng.random() > 0.1
+        else "not a reading"
+        for _ in range(rng.randint(0, readings // 4))
+    ]
+    # The frontend posts behaviors as one {name: average} dict
+    if rng.random() < 0.3:
+        expressions = {spell(name): rng.random() for name in expression_names[:8]}
+    return emotions, expressions
+
+
+def synthetic_interviews(count=200, readings=200, seed=0):
+    rng = random.Random(seed)
+    interviews = [synthetic_interview(rng, readings) for _ in range(count)]
+    return interviews + [([], []), ([], {}), ([{"timestamp": "0", "emotions": {}}], [{}])]
+
+
+@pytest.fixture(scope="module")
+def interviews():
+    return synthetic_interviews()
+
+
+def test_score_interviews_matches_legacy(interviews):
+    expected = [legacy_interview_score(*interview) for interview in interviews]
+    assert score_interviews(interviews).tolist() == expected
+
+
+def test_score_interview_matches_legacy(interviews):
+    for interview in interviews:
+        assert score_interview(*interview) == legacy_interview_score(*interview)
+
+
+def test_score_timeline_matches_legacy(interviews):
+    # The timeline sums readings per window first, so only rounding may differ
+    for emotions, expressions in interviews:
+        timeline = EmotionTimeline.from_readings(emotions)
+        assert score_timeline(timeline, expressions) == pytest.approx(
+            legacy_interview_score(emotions, expressions), abs=1e-9
+        )
+
+
+def test_custom_weight_tables():
+    engine = ScoringEngine({"Joy": 2}, {"SMILE": 3})
+    emotions = [{"timestamp": "1", "emotions": {"Joy": 0.5, "Fear": 9}}]
+    assert engine.score_interview(emotions, [{"smile": 2}]) == 7.0
+    assert engine.score_timeline(EmotionTimeline.from_readings(emotions), [{"smile": 2}]) == 7.0
+
+
+def test_layout_cache_reset_keeps_scores():
+    # More distinct layouts than the cache holds, repeated after it resets
+    readings = [
+        {"timestamp": str(i), "emotions": {"Anger": 0.5, f"Unknown {i}": 1.0}}
+        for i in range(600)
+    ]
+    engine = ScoringEngine()
+    first = engine.emotion_scores([readings])
+    assert first.tolist() == engine.emotion_scores([readings]).tolist() == [-600.0]
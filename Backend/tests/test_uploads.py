@@ -0,0 +1,167 @@
+"""
+Streaming upload checks: a generated multipart body driven over raw ASGI
+through StreamingUploadRequest and BackpressureHTTPConnection must land in a
+scratch file without the process growing with the upload, and a chunked body
+without a Content-Length must still be cut off at max_content_length.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import pytest
+from quart import Quart, jsonify, request
+
+from uploads import (
+    BackpressureHTTPConnection,
+    StreamingUploadRequest,
+    remove_scratch_files,
+    scratch_path,
+    upload_digest,
+)
+
+MIB = 1024 * 1024
+BOUNDARY = "testboundary"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class GeneratedBody:
+    """A multipart body produced on the fly, a MiB of zeros at a time."""
+
+    def __init__(self, size_mb):
+        self.head = (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="recording.mp4"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+        self.tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+        self.remaining = size_mb
+        self.length = len(self.head) + size_mb * MIB + len(self.tail)
+        self.buffer = self.head
+
+    def read(self, size):
+        while len(self.buffer) < size and self.remaining >= 0:
+            self.buffer += b"\0" * MIB if self.remaining > 0 else self.tail
+            self.remaining -= 1
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def current_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def make_app(max_content_length):
+    app = Quart(__name__)
+    app.request_class = StreamingUploadRequest
+    app.asgi_http_class = BackpressureHTTPConnection
+    app.config["MAX_CONTENT_LENGTH"] = max_content_length
+
+    @app.route("/upload", methods=["POST"])
+    async def upload():
+        file = (await request.files)["file"]
+        path = scratch_path(file)
+        return jsonify({"bytes": os.path.getsize(path), "sha256": upload_digest(file)})
+
+    @app.teardown_request
+    async def teardown(exception=None):
+        remove_scratch_files(request)
+
+    return app
+
+
+def post(app, body, content_length=True, on_chunk=None):
+    """Sends body to /upload in 64 KiB messages; returns (status, payload)."""
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(body.length).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+        "extensions": {},
+    }
+    sent = []
+
+    async def run():
+        body_sent = False
+        response_done = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if body_sent:
+                await response_done.wait()
+                return {"type": "http.disconnect"}
+            data = body.read(64 * 1024)
+            body_sent = not data
+            if on_chunk is not None:
+                on_chunk()
+            return {"type": "http.request", "body": data, "more_body": bool(data)}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                response_done.set()
+
+        await app(scope, receive, send)
+
+    asyncio.run(run())
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, payload
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc")
+def test_streamed_upload_keeps_rss_flat(tmp_path, monkeypatch):
+    monkeypatch.setattr("uploads.UPLOAD_DIR", str(tmp_path))
+    size_mb = 128
+    app = make_app(None)
+    baseline = current_rss()
+    peak = baseline
+
+    def sample():
+        nonlocal peak
+        peak = max(peak, current_rss())
+
+    status, payload = post(app, GeneratedBody(size_mb), on_chunk=sample)
+
+    assert status == 200, payload
+    result = json.loads(payload)
+    assert result["bytes"] == size_mb * MIB
+    expected = hashlib.sha256()
+    for _ in range(size_mb):
+        expected.update(b"\0" * MIB)
+    assert result["sha256"] == expected.hexdigest()
+    # Allow a little allocator noise, but nothing proportional to the upload
+    assert peak - baseline < 32 * MIB
+    assert os.listdir(tmp_path) == []
+
+
+def test_chunked_upload_over_limit_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr("uploads.UPLOAD_DIR", str(tmp_path))
+    app = make_app(4 * MIB)
+
+    status, _ = post(app, GeneratedBody(16), content_length=False)
+
+    assert status == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_chunked_upload_under_limit_is_accepted(tmp_path, monkeypatch):
+    monkeypatch.setattr("uploads.UPLOAD_DIR", str(tmp_path))
+    app = make_app(4 * MIB)
+
+    status, payload = post(app, GeneratedBody(2), content_length=False)
+
+    assert status == 200, payload
+    assert json.loads(payload)["bytes"] == 2 * MIB
@@ -32,6 +32,7 @@ const Interview = ({ isDarkTheme, setIsDarkTheme }) => {
 	const mediaStream = useRef(null); // Store media stream reference
 	const [loading, setLoading] = useState(true);
 	const [questions, setQuestions] = useState([]);
+	const [questionTimes, setQuestionTimes] = useState([]); // Seconds into the interview each question was asked
 
 	// HUME
 	const [conversationHistory, setConversationHistory] = useState([]); // Holds conversation history
@@ -88,6 +89,7 @@ const Interview = ({ isDarkTheme, setIsDarkTheme }) => {
 		});
 
 		if (role === "assistant") {
+			setQuestionTimes((prev) => [...prev, parseFloat(timestamp)]);
 			await askQuestion(content);
 		}
 
@@ -127,6 +129,12 @@ const Interview = ({ isDarkTheme, setIsDarkTheme }) => {
 		}
 	}, [questions]);
 
+	useEffect(() => {
+		if (questionTimes.length > 0) {
+			localStorage.setItem("questionTimes", JSON.stringify(questionTimes));
+		}
+	}, [questionTimes]);
+
 	/*
 	Start & Stop Video
 	*/
@@ -242,6 +250,8 @@ const Interview = ({ isDarkTheme, setIsDarkTheme }) => {
 					behaviors: behaviors,
 					emotions: JSON.parse(localStorage.getItem("emotions")),
 					length: Object.keys(transcript).length,
+					question_times: JSON.parse(localStorage.getItem("questionTimes")),
+					facs_series: voiceResponse.data.facs_series,
 				}),
 				{
 					headers: { "Content-Type": "application/json" },